@@ -5,13 +5,152 @@ Replaces JSON file storage with database operations while maintaining the same i
 """
 
 import os
+import copy
+import csv
+import io
 import json
 import logging
 import sqlite3
+import time
+from contextlib import contextmanager
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# SQLite stores BOOLEAN columns as 0/1; return them as Python bools
+# (Postgres/psycopg2 already does). Used via detect_types=PARSE_DECLTYPES.
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+
+# All tables and indexes, created in one batch by _create_tables
+SCHEMA_DDL = """
+-- Groups configuration table
+CREATE TABLE IF NOT EXISTS groups (
+    group_id TEXT PRIMARY KEY,
+    chain_id TEXT NOT NULL,
+    token TEXT NOT NULL,
+    min_balance REAL NOT NULL,
+    verifier TEXT NOT NULL
+);
+
+-- User verification data table
+CREATE TABLE IF NOT EXISTS user_data (
+    group_id TEXT,
+    user_id TEXT,
+    address TEXT,
+    verified BOOLEAN,
+    last_verified INTEGER,
+    verification_tx BOOLEAN,
+    PRIMARY KEY (group_id, user_id)
+);
+
+-- Whitelist table
+CREATE TABLE IF NOT EXISTS whitelist (
+    group_id TEXT PRIMARY KEY,
+    whitelisted BOOLEAN DEFAULT TRUE
+);
+
+-- Pending whitelist table
+CREATE TABLE IF NOT EXISTS pending_whitelist (
+    group_id TEXT PRIMARY KEY,
+    group_name TEXT,
+    admin_id TEXT,
+    admin_name TEXT,
+    timestamp INTEGER
+);
+
+-- Rejected groups table (3-strike system)
+CREATE TABLE IF NOT EXISTS rejected_groups (
+    group_id TEXT PRIMARY KEY,
+    rejection_count INTEGER DEFAULT 0,
+    group_name TEXT,
+    last_admin_id TEXT,
+    last_admin_name TEXT,
+    first_rejection INTEGER,
+    last_rejection INTEGER,
+    blocked BOOLEAN DEFAULT FALSE
+);
+
+-- Verification links table
+CREATE TABLE IF NOT EXISTS verification_links (
+    token TEXT PRIMARY KEY,
+    group_id TEXT,
+    created_at INTEGER
+);
+
+-- Per-group lookups (user_data.group_id is already covered by its primary key)
+CREATE INDEX IF NOT EXISTS idx_vlinks_group ON verification_links(group_id);
+-- Range scan for expiring old verification links
+CREATE INDEX IF NOT EXISTS idx_vlinks_created ON verification_links(created_at);
+CREATE INDEX IF NOT EXISTS idx_user_data_verified ON user_data(group_id, verified) WHERE verified;
+"""
+
+# Whole-table loads built by the database as one JSON document
+# (one round-trip and one parse instead of per-row dict assembly)
+USER_DATA_JSON_SQL = {
+    "sqlite": """
+        SELECT json_group_object(group_id, json(users)) FROM (
+            SELECT group_id, json_group_object(user_id, json_object(
+                'address', address,
+                'verified', json(CASE WHEN verified THEN 'true' ELSE 'false' END),
+                'last_verified', last_verified,
+                'verification_tx', json(CASE WHEN verification_tx THEN 'true' ELSE 'false' END)
+            )) AS users
+            FROM user_data GROUP BY group_id
+        )
+    """,
+    "postgres": """
+        SELECT json_object_agg(group_id, users) FROM (
+            SELECT group_id, json_object_agg(user_id, json_build_object(
+                'address', address,
+                'verified', COALESCE(verified, FALSE),
+                'last_verified', last_verified,
+                'verification_tx', COALESCE(verification_tx, FALSE)
+            )) AS users
+            FROM user_data GROUP BY group_id
+        ) AS grouped
+    """,
+}
+CONFIG_JSON_SQL = {
+    "sqlite": """
+        SELECT json_group_object(group_id, json_object(
+            'chain_id', chain_id, 'token', token,
+            'min_balance', min_balance, 'verifier', verifier
+        )) FROM groups
+    """,
+    "postgres": """
+        SELECT json_object_agg(group_id, json_build_object(
+            'chain_id', chain_id, 'token', token,
+            'min_balance', min_balance, 'verifier', verifier
+        )) FROM groups
+    """,
+}
+
+# WAL lets readers (cron) and the writer (bot) work concurrently;
+# synchronous=NORMAL avoids a full fsync on every commit in WAL mode
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Seconds a loaded table is served from memory before hitting the database again
+CACHE_TTL = 60
+
+# Verification links expire after VERIFICATION_LINK_TTL_DAYS, except each group's
+# newest token: the bot keeps handing that one out, so it never expires. Expired
+# rows are deleted at startup and at most once per LINK_GC_INTERVAL on save
+VERIFICATION_LINK_TTL = int(os.getenv("VERIFICATION_LINK_TTL_DAYS", "30")) * 86400
+LINK_GC_INTERVAL = 3600
+
 class DatabaseAdapter:
     """Database adapter that mimics JSON file interface"""
 
@@ -19,12 +158,19 @@ class DatabaseAdapter:
         """Initialize database connection"""
         self.database_url = database_url or os.getenv("DATABASE_URL")
         self.is_postgres = self.database_url and self.database_url.startswith("postgres")
+        # Last saved rows per table (key -> compared values), used to write diffs
+        self._snapshots: Dict[str, Dict[tuple, tuple]] = {}
+        # Parsed tables (table -> (loaded_at, data)); saves refresh the entry
+        self._cache: Dict[str, tuple] = {}
+
+        self.pool = None
+        self.connection = None
 
         if self.is_postgres:
             try:
-                import psycopg2
-                self.connection = psycopg2.connect(self.database_url)
-                logger.info("✅ Connected to PostgreSQL database")
+                from psycopg2.pool import ThreadedConnectionPool
+                self.pool = ThreadedConnectionPool(minconn=1, maxconn=10, dsn=self.database_url)
+                logger.info("✅ Connected to PostgreSQL database (pooled)")
             except ImportError:
                 logger.error("❌ psycopg2 not installed. Install with: pip install psycopg2-binary")
                 self._fallback_to_sqlite()
@@ -35,361 +181,495 @@ class DatabaseAdapter:
             self._fallback_to_sqlite()
 
         self._create_tables()
+        self._last_links_gc = 0.0
+        self.gc_verification_links()
 
     def _fallback_to_sqlite(self):
         """Fallback to SQLite if PostgreSQL is not available"""
         data_dir = os.getenv("DATA_DIR", ".")
         db_path = os.path.join(data_dir, "biggie.db")
-        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection = sqlite3.connect(
+            db_path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        if db_path != ":memory:":
+            for pragma in SQLITE_PRAGMAS:
+                self.connection.execute(pragma)
         self.is_postgres = False
         logger.info(f"✅ Connected to SQLite database: {db_path}")
 
+    @contextmanager
+    def _conn(self):
+        """Yield a pooled Postgres connection, or the shared SQLite connection"""
+        if self.pool is None:
+            yield self.connection
+            return
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn, close=bool(conn.closed))
+
     def _create_tables(self):
         """Create all required tables"""
-        cursor = self.connection.cursor()
-
-        # Groups configuration table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS groups (
-                group_id TEXT PRIMARY KEY,
-                chain_id TEXT NOT NULL,
-                token TEXT NOT NULL,
-                min_balance REAL NOT NULL,
-                verifier TEXT NOT NULL
-            )
-        """)
-
-        # User verification data table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_data (
-                group_id TEXT,
-                user_id TEXT,
-                address TEXT,
-                verified BOOLEAN,
-                last_verified INTEGER,
-                verification_tx BOOLEAN,
-                PRIMARY KEY (group_id, user_id)
-            )
-        """)
-
-        # Whitelist table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS whitelist (
-                group_id TEXT PRIMARY KEY,
-                whitelisted BOOLEAN DEFAULT TRUE
-            )
-        """)
-
-        # Pending whitelist table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pending_whitelist (
-                group_id TEXT PRIMARY KEY,
-                group_name TEXT,
-                admin_id TEXT,
-                admin_name TEXT,
-                timestamp INTEGER
-            )
-        """)
-
-        # Rejected groups table (3-strike system)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rejected_groups (
-                group_id TEXT PRIMARY KEY,
-                rejection_count INTEGER DEFAULT 0,
-                group_name TEXT,
-                last_admin_id TEXT,
-                last_admin_name TEXT,
-                first_rejection INTEGER,
-                last_rejection INTEGER,
-                blocked BOOLEAN DEFAULT FALSE
+        with self._conn() as conn:
+            if self.is_postgres:
+                # psycopg2 accepts several statements in one execute
+                conn.cursor().execute(SCHEMA_DDL)
+                conn.commit()
+            else:
+                # One batch, one schema lock (executescript commits itself)
+                conn.executescript(SCHEMA_DDL)
+            logger.info("✅ Database tables created/verified")
+
+    def _cursor(self, conn, name: str):
+        """Cursor for streaming a SELECT (server-side on Postgres, fetched in batches)"""
+        if self.is_postgres:
+            cursor = conn.cursor(name=name)
+            cursor.itersize = 10000
+            return cursor
+        return conn.cursor()
+
+    def _load_json(self, conn, queries: Dict[str, str]) -> Dict[str, Any]:
+        """Run a JSON-aggregating SELECT and return its document ({} for an empty table)"""
+        cursor = conn.cursor()
+        cursor.execute(queries["postgres" if self.is_postgres else "sqlite"])
+        document = cursor.fetchone()[0]
+        if document is None:
+            return {}
+        # psycopg2 already parses json columns; SQLite returns text
+        return document if isinstance(document, dict) else _loads(document)
+
+    def _cache_get(self, table: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached table if it is still fresh"""
+        cached = self._cache.get(table)
+        if cached and time.monotonic() - cached[0] < CACHE_TTL:
+            return copy.deepcopy(cached[1])
+        return None
+
+    def _cache_set(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache a copy of a table's data and return the data"""
+        self._cache[table] = (time.monotonic(), copy.deepcopy(data))
+        return data
+
+    def _insert_many(self, cursor, table: str, columns: tuple, rows: list, suffix: str = ""):
+        """Insert all rows in one batch (execute_values on Postgres, executemany on SQLite)"""
+        if not rows:
+            return
+        column_list = ", ".join(columns)
+        if self.is_postgres:
+            from psycopg2.extras import execute_values
+            execute_values(
+                cursor,
+                f"INSERT INTO {table} ({column_list}) VALUES %s {suffix}",
+                rows,
+                page_size=1000,
             )
-        """)
-
-        # Verification links table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS verification_links (
-                token TEXT PRIMARY KEY,
-                group_id TEXT,
-                created_at INTEGER
+        else:
+            placeholders = ", ".join("?" * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) {suffix}",
+                rows,
             )
-        """)
 
-        self.connection.commit()
-        logger.info("✅ Database tables created/verified")
+    def _copy_rows(self, cursor, table: str, columns: tuple, rows: list):
+        """Bulk-load rows into a Postgres table with COPY ... FROM STDIN (CSV)"""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        # QUOTE_NOTNULL (3.12+) keeps '' distinct from NULL; unquoted empty fields are NULL
+        writer = csv.writer(buffer, quoting=getattr(csv, "QUOTE_NOTNULL", csv.QUOTE_MINIMAL))
+        writer.writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV", buffer
+        )
+
+    def _save_rows(self, cursor, table: str, columns: tuple, rows: list,
+                   key_count: int = 1, update_columns: Optional[tuple] = None) -> Dict[tuple, tuple]:
+        """
+        Write rows as a diff against the last saved snapshot of the table:
+        upsert new/changed rows and delete rows whose key is gone.
+        The first save in a process rewrites the table to establish the snapshot
+        (bulk-loaded with COPY on Postgres).
+        Returns the new snapshot; store it in self._snapshots only after commit.
+        """
+        key_columns = columns[:key_count]
+        if update_columns is None:
+            update_columns = columns[key_count:]
+        compared = [columns.index(column) for column in update_columns]
+        snapshot = {row[:key_count]: tuple(row[i] for i in compared) for row in rows}
+
+        previous = self._snapshots.get(table)
+        if previous is None:
+            cursor.execute(f"DELETE FROM {table}")
+            if self.is_postgres:
+                self._copy_rows(cursor, table, columns, rows)
+            else:
+                self._insert_many(cursor, table, columns, rows)
+            return snapshot
+
+        changed = [row for row in rows if previous.get(row[:key_count]) != snapshot[row[:key_count]]]
+        removed = [key for key in previous if key not in snapshot]
+
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in update_columns)
+        self._insert_many(
+            cursor, table, columns, changed,
+            suffix=f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {assignments}",
+        )
+        if removed:
+            placeholder = "%s" if self.is_postgres else "?"
+            where = " AND ".join(f"{column} = {placeholder}" for column in key_columns)
+            cursor.executemany(f"DELETE FROM {table} WHERE {where}", removed)
+
+        return snapshot
 
     def load_config(self) -> Dict[str, Any]:
         """Load groups configuration (replaces config.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT group_id, chain_id, token, min_balance, verifier FROM groups")
+        cached = self._cache_get("groups")
+        if cached is not None:
+            return cached
 
-        config = {}
-        for row in cursor.fetchall():
-            group_id, chain_id, token, min_balance, verifier = row
-            config[group_id] = {
-                "chain_id": chain_id,
-                "token": token,
-                "min_balance": min_balance,
-                "verifier": verifier
-            }
-
-        return config
+        with self._conn() as conn:
+            config = self._load_json(conn, CONFIG_JSON_SQL)
+            return self._cache_set("groups", config)
 
     def save_config(self, config: Dict[str, Any]) -> bool:
         """Save groups configuration (replaces config.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing config
-            cursor.execute("DELETE FROM groups")
-
-            # Insert new config
-            for group_id, group_config in config.items():
-                cursor.execute("""
-                    INSERT INTO groups (group_id, chain_id, token, min_balance, verifier)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    group_id,
-                    group_config["chain_id"],
-                    group_config["token"],
-                    group_config["min_balance"],
-                    group_config["verifier"]
-                ))
-
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving config: {e}")
-            return False
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+
+                # Upsert changed rows, delete removed ones
+                rows = [
+                    (
+                        group_id,
+                        group_config["chain_id"],
+                        group_config["token"],
+                        group_config["min_balance"],
+                        group_config["verifier"]
+                    )
+                    for group_id, group_config in config.items()
+                ]
+                snapshot = self._save_rows(
+                    cursor, "groups",
+                    ("group_id", "chain_id", "token", "min_balance", "verifier"),
+                    rows,
+                )
+
+                conn.commit()
+                self._snapshots["groups"] = snapshot
+                self._cache_set("groups", config)
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving config: {e}")
+                return False
 
     def load_user_data(self) -> Dict[str, Any]:
         """Load user verification data (replaces user_data.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT group_id, user_id, address, verified, last_verified, verification_tx
-            FROM user_data
-        """)
-
-        user_data = {}
-        for row in cursor.fetchall():
-            group_id, user_id, address, verified, last_verified, verification_tx = row
+        cached = self._cache_get("user_data")
+        if cached is not None:
+            return cached
 
-            if group_id not in user_data:
-                user_data[group_id] = {}
-
-            user_data[group_id][user_id] = {
-                "address": address,
-                "verified": bool(verified),
-                "last_verified": last_verified,
-                "verification_tx": bool(verification_tx)
-            }
-
-        return user_data
+        with self._conn() as conn:
+            user_data = self._load_json(conn, USER_DATA_JSON_SQL)
+            return self._cache_set("user_data", user_data)
 
     def save_user_data(self, user_data: Dict[str, Any]) -> bool:
         """Save user verification data (replaces user_data.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing data
-            cursor.execute("DELETE FROM user_data")
-
-            # Insert new data
-            for group_id, users in user_data.items():
-                for user_id, user_info in users.items():
-                    cursor.execute("""
-                        INSERT INTO user_data
-                        (group_id, user_id, address, verified, last_verified, verification_tx)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+
+                # Upsert changed rows, delete removed ones
+                rows = [
+                    (
                         group_id,
                         user_id,
                         user_info.get("address"),
                         user_info.get("verified", False),
                         user_info.get("last_verified"),
                         user_info.get("verification_tx", False)
-                    ))
-
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving user data: {e}")
-            return False
+                    )
+                    for group_id, users in user_data.items()
+                    for user_id, user_info in users.items()
+                ]
+                snapshot = self._save_rows(
+                    cursor, "user_data",
+                    ("group_id", "user_id", "address", "verified", "last_verified", "verification_tx"),
+                    rows,
+                    key_count=2,
+                )
+
+                conn.commit()
+                self._snapshots["user_data"] = snapshot
+                self._cache_set("user_data", user_data)
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving user data: {e}")
+                return False
 
     def load_whitelist(self) -> Dict[str, Any]:
         """Load whitelist data (replaces whitelist.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT group_id, whitelisted FROM whitelist")
+        cached = self._cache_get("whitelist")
+        if cached is not None:
+            return cached
+
+        with self._conn() as conn:
+            cursor = self._cursor(conn, "load_whitelist")
+            cursor.execute("SELECT group_id, whitelisted FROM whitelist")
 
-        whitelist = {}
-        for row in cursor.fetchall():
-            group_id, whitelisted = row
-            whitelist[group_id] = bool(whitelisted)
+            whitelist = {}
+            for row in cursor:
+                group_id, whitelisted = row
+                whitelist[group_id] = whitelisted
 
-        return whitelist
+            return self._cache_set("whitelist", whitelist)
 
     def save_whitelist(self, whitelist: Dict[str, Any]) -> bool:
         """Save whitelist data (replaces whitelist.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing data
-            cursor.execute("DELETE FROM whitelist")
-
-            # Insert new data
-            for group_id, whitelisted in whitelist.items():
-                cursor.execute("""
-                    INSERT INTO whitelist (group_id, whitelisted)
-                    VALUES (?, ?)
-                """, (group_id, whitelisted))
-
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving whitelist: {e}")
-            return False
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+
+                # Upsert changed rows, delete removed ones
+                snapshot = self._save_rows(
+                    cursor, "whitelist",
+                    ("group_id", "whitelisted"),
+                    list(whitelist.items()),
+                )
+
+                conn.commit()
+                self._snapshots["whitelist"] = snapshot
+                self._cache_set("whitelist", whitelist)
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving whitelist: {e}")
+                return False
 
     def load_pending_whitelist(self) -> Dict[str, Any]:
         """Load pending whitelist data (replaces pending_whitelist.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT group_id, group_name, admin_id, admin_name, timestamp
-            FROM pending_whitelist
-        """)
-
-        pending = {}
-        for row in cursor.fetchall():
-            group_id, group_name, admin_id, admin_name, timestamp = row
-            pending[group_id] = {
-                "group_name": group_name,
-                "admin_id": admin_id,
-                "admin_name": admin_name,
-                "timestamp": timestamp
-            }
-
-        return pending
+        cached = self._cache_get("pending_whitelist")
+        if cached is not None:
+            return cached
+
+        with self._conn() as conn:
+            cursor = self._cursor(conn, "load_pending_whitelist")
+            cursor.execute("""
+                SELECT group_id, group_name, admin_id, admin_name, timestamp
+                FROM pending_whitelist
+            """)
+
+            pending = {}
+            for row in cursor:
+                group_id, group_name, admin_id, admin_name, timestamp = row
+                pending[group_id] = {
+                    "group_name": group_name,
+                    "admin_id": admin_id,
+                    "admin_name": admin_name,
+                    "timestamp": timestamp
+                }
+
+            return self._cache_set("pending_whitelist", pending)
 
     def save_pending_whitelist(self, pending: Dict[str, Any]) -> bool:
         """Save pending whitelist data (replaces pending_whitelist.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing data
-            cursor.execute("DELETE FROM pending_whitelist")
-
-            # Insert new data
-            for group_id, pending_info in pending.items():
-                cursor.execute("""
-                    INSERT INTO pending_whitelist
-                    (group_id, group_name, admin_id, admin_name, timestamp)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    group_id,
-                    pending_info.get("group_name"),
-                    pending_info.get("admin_id"),
-                    pending_info.get("admin_name"),
-                    pending_info.get("timestamp")
-                ))
-
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving pending whitelist: {e}")
-            return False
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+
+                # Upsert changed rows, delete removed ones
+                rows = [
+                    (
+                        group_id,
+                        pending_info.get("group_name"),
+                        pending_info.get("admin_id"),
+                        pending_info.get("admin_name"),
+                        pending_info.get("timestamp")
+                    )
+                    for group_id, pending_info in pending.items()
+                ]
+                snapshot = self._save_rows(
+                    cursor, "pending_whitelist",
+                    ("group_id", "group_name", "admin_id", "admin_name", "timestamp"),
+                    rows,
+                )
+
+                conn.commit()
+                self._snapshots["pending_whitelist"] = snapshot
+                self._cache_set("pending_whitelist", pending)
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving pending whitelist: {e}")
+                return False
 
     def load_rejected_groups(self) -> Dict[str, Any]:
         """Load rejected groups data (replaces rejected_groups.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT group_id, rejection_count, group_name, last_admin_id,
-                   last_admin_name, first_rejection, last_rejection, blocked
-            FROM rejected_groups
-        """)
-
-        rejected = {}
-        for row in cursor.fetchall():
-            (group_id, rejection_count, group_name, last_admin_id,
-             last_admin_name, first_rejection, last_rejection, blocked) = row
-
-            rejected[group_id] = {
-                "rejection_count": rejection_count,
-                "group_name": group_name,
-                "last_admin_id": last_admin_id,
-                "last_admin_name": last_admin_name,
-                "first_rejection": first_rejection,
-                "last_rejection": last_rejection,
-                "blocked": bool(blocked)
-            }
-
-        return rejected
+        cached = self._cache_get("rejected_groups")
+        if cached is not None:
+            return cached
+
+        with self._conn() as conn:
+            cursor = self._cursor(conn, "load_rejected_groups")
+            cursor.execute("""
+                SELECT group_id, rejection_count, group_name, last_admin_id,
+                       last_admin_name, first_rejection, last_rejection, blocked
+                FROM rejected_groups
+            """)
+
+            rejected = {}
+            for row in cursor:
+                (group_id, rejection_count, group_name, last_admin_id,
+                 last_admin_name, first_rejection, last_rejection, blocked) = row
+
+                rejected[group_id] = {
+                    "rejection_count": rejection_count,
+                    "group_name": group_name,
+                    "last_admin_id": last_admin_id,
+                    "last_admin_name": last_admin_name,
+                    "first_rejection": first_rejection,
+                    "last_rejection": last_rejection,
+                    "blocked": blocked
+                }
+
+            return self._cache_set("rejected_groups", rejected)
 
     def save_rejected_groups(self, rejected: Dict[str, Any]) -> bool:
         """Save rejected groups data (replaces rejected_groups.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing data
-            cursor.execute("DELETE FROM rejected_groups")
-
-            # Insert new data
-            for group_id, rejected_info in rejected.items():
-                cursor.execute("""
-                    INSERT INTO rejected_groups
-                    (group_id, rejection_count, group_name, last_admin_id,
-                     last_admin_name, first_rejection, last_rejection, blocked)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    group_id,
-                    rejected_info.get("rejection_count", 0),
-                    rejected_info.get("group_name"),
-                    rejected_info.get("last_admin_id"),
-                    rejected_info.get("last_admin_name"),
-                    rejected_info.get("first_rejection"),
-                    rejected_info.get("last_rejection"),
-                    rejected_info.get("blocked", False)
-                ))
-
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving rejected groups: {e}")
-            return False
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+
+                # Upsert changed rows, delete removed ones
+                rows = [
+                    (
+                        group_id,
+                        rejected_info.get("rejection_count", 0),
+                        rejected_info.get("group_name"),
+                        rejected_info.get("last_admin_id"),
+                        rejected_info.get("last_admin_name"),
+                        rejected_info.get("first_rejection"),
+                        rejected_info.get("last_rejection"),
+                        rejected_info.get("blocked", False)
+                    )
+                    for group_id, rejected_info in rejected.items()
+                ]
+                snapshot = self._save_rows(
+                    cursor, "rejected_groups",
+                    ("group_id", "rejection_count", "group_name", "last_admin_id",
+                     "last_admin_name", "first_rejection", "last_rejection", "blocked"),
+                    rows,
+                )
+
+                conn.commit()
+                self._snapshots["rejected_groups"] = snapshot
+                self._cache_set("rejected_groups", rejected)
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving rejected groups: {e}")
+                return False
 
     def load_verification_links(self) -> Dict[str, Any]:
         """Load verification links data (replaces verification_links.json)"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT token, group_id FROM verification_links")
+        cached = self._cache_get("verification_links")
+        if cached is not None:
+            return cached
+
+        with self._conn() as conn:
+            cursor = self._cursor(conn, "load_verification_links")
+            cursor.execute("SELECT token, group_id FROM verification_links")
 
-        links = {}
-        for row in cursor.fetchall():
-            token, group_id = row
-            links[token] = group_id
+            links = {}
+            for row in cursor:
+                token, group_id = row
+                links[token] = group_id
 
-        return links
+            return self._cache_set("verification_links", links)
 
     def save_verification_links(self, links: Dict[str, Any]) -> bool:
         """Save verification links data (replaces verification_links.json)"""
-        try:
-            cursor = self.connection.cursor()
-
-            # Clear existing data
-            cursor.execute("DELETE FROM verification_links")
-
-            # Insert new data
-            for token, group_id in links.items():
-                cursor.execute("""
-                    INSERT INTO verification_links (token, group_id, created_at)
-                    VALUES (?, ?, ?)
-                """, (token, group_id, int(time.time())))
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+                previous = self._snapshots.get("verification_links", {})
+
+                # Insert new tokens only; existing rows keep their original created_at
+                created_at = time.time_ns() // 1_000_000_000
+                self._insert_many(
+                    cursor, "verification_links",
+                    ("token", "group_id", "created_at"),
+                    [
+                        (token, group_id, created_at)
+                        for token, group_id in links.items()
+                        if (token,) not in previous
+                    ],
+                    suffix="ON CONFLICT (token) DO NOTHING",
+                )
+
+                # Delete tokens dropped since the last save (expiry is left to the GC)
+                removed = [key for key in previous if key[0] not in links]
+                if removed:
+                    placeholder = "%s" if self.is_postgres else "?"
+                    cursor.executemany(
+                        f"DELETE FROM verification_links WHERE token = {placeholder}", removed
+                    )
+
+                conn.commit()
+                self._snapshots["verification_links"] = {
+                    (token,): (group_id,) for token, group_id in links.items()
+                }
+                self._cache_set("verification_links", links)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error saving verification links: {e}")
+                return False
+
+        if time.monotonic() - self._last_links_gc >= LINK_GC_INTERVAL:
+            self.gc_verification_links()
+        return True
+
+    def gc_verification_links(self) -> int:
+        """Delete superseded verification links older than VERIFICATION_LINK_TTL; returns rows removed"""
+        self._last_links_gc = time.monotonic()
+        cutoff = time.time_ns() // 1_000_000_000 - VERIFICATION_LINK_TTL
+        placeholder = "%s" if self.is_postgres else "?"
+        with self._conn() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""
+                    DELETE FROM verification_links
+                    WHERE created_at < {placeholder}
+                      AND created_at < (
+                          SELECT MAX(v.created_at) FROM verification_links v
+                          WHERE v.group_id = verification_links.group_id
+                      )
+                    """,
+                    (cutoff,),
+                )
+                removed = cursor.rowcount
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error expiring verification links: {e}")
+                return 0
 
-            self.connection.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving verification links: {e}")
-            return False
+        if removed:
+            # Next load reads the pruned table
+            self._cache.pop("verification_links", None)
+            logger.info(f"🧹 Expired {removed} verification links")
+        return removed
 
     def close(self):
-        """Close database connection"""
-        if self.connection:
+        """Close database connection(s)"""
+        if self.pool is not None:
+            self.pool.closeall()
+            logger.info("✅ Database pool closed")
+        elif self.connection:
             self.connection.close()
             logger.info("✅ Database connection closed")
 
@@ -5,155 +5,373 @@ Minimale Änderung - ersetzt nur load_json_file und save_json_file
 """
 
 import os
-import json
+import atexit
+import copy
 import logging
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Get database connection - PostgreSQL or SQLite fallback"""
+# orjson (C extension) when available, stdlib json otherwise
+try:
+    import orjson
+
+    def _dumps(data, pretty=False):
+        """Serialize to a JSON str (non-str dict keys allowed, like json.dumps)"""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, option=option).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(data, pretty=False):
+        """Serialize to a JSON str"""
+        return json.dumps(data, indent=2 if pretty else None)
+
+    _loads = json.loads
+
+# WAL lets readers (cron) and the writer (bot) work concurrently;
+# synchronous=NORMAL avoids a full fsync on every commit in WAL mode
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+def _configure_sqlite(conn, db_path):
+    """Apply performance PRAGMAs to a fresh SQLite connection"""
+    if db_path == ":memory:":
+        return
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+# SQLite 3.45+ stores JSON in its binary JSONB format; json() reads both
+# JSONB blobs and legacy TEXT rows, so no migration is needed
+SQLITE_JSONB = sqlite3.sqlite_version_info >= (3, 45, 0)
+SQLITE_JSON_PARAM = "jsonb(?)" if SQLITE_JSONB else "?"
+
+# Statements per backend, picked once when the database is opened
+SELECT_JSON_SQL = {
+    "postgres": "SELECT json_data FROM json_storage WHERE table_name = %s",
+    "sqlite": (
+        "SELECT json(json_data) FROM json_storage WHERE table_name = ?"
+        if SQLITE_JSONB else
+        "SELECT json_data FROM json_storage WHERE table_name = ?"
+    ),
+}
+UPSERT_JSON_SQL = {
+    "postgres": """
+        INSERT INTO json_storage (table_name, json_data)
+        VALUES (%s, %s)
+        ON CONFLICT (table_name)
+        DO UPDATE SET
+            json_data = EXCLUDED.json_data,
+            updated_at = NOW()
+    """,
+    "sqlite": f"""
+        INSERT INTO json_storage (table_name, json_data)
+        VALUES (?, {SQLITE_JSON_PARAM})
+        ON CONFLICT (table_name)
+        DO UPDATE SET
+            json_data = excluded.json_data,
+            updated_at = CURRENT_TIMESTAMP
+    """,
+}
+
+# Table DDL per backend (run once per process, when the connection is opened)
+JSON_STORAGE_DDL = {
+    "postgres": """
+        CREATE TABLE IF NOT EXISTS json_storage (
+            table_name VARCHAR(50) PRIMARY KEY,
+            json_data JSONB NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS json_storage (
+            table_name TEXT PRIMARY KEY,
+            json_data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+# Verification links get their own indexed table: a token lookup reads one row
+# instead of parsing every link (same schema as database_adapter's table)
+VERIFICATION_LINKS_DDL = """
+    CREATE TABLE IF NOT EXISTS verification_links (
+        token TEXT PRIMARY KEY,
+        group_id TEXT,
+        created_at INTEGER
+    )
+"""
+VERIFICATION_LINKS_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS idx_vlinks_group ON verification_links(group_id)"
+)
+INSERT_LINK_SQL = {
+    "postgres": """
+        INSERT INTO verification_links (token, group_id, created_at)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (token) DO UPDATE SET group_id = EXCLUDED.group_id
+    """,
+    "sqlite": """
+        INSERT INTO verification_links (token, group_id, created_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (token) DO UPDATE SET group_id = excluded.group_id
+    """,
+}
+SELECT_LINK_SQL = {
+    "postgres": "SELECT group_id FROM verification_links WHERE token = %s",
+    "sqlite": "SELECT group_id FROM verification_links WHERE token = ?",
+}
+# Newest token of a group: the one the bot hands out (and the link GC keeps)
+SELECT_GROUP_TOKEN_SQL = {
+    "postgres": """
+        SELECT token FROM verification_links WHERE group_id = %s
+        ORDER BY created_at DESC LIMIT 1
+    """,
+    "sqlite": """
+        SELECT token FROM verification_links WHERE group_id = ?
+        ORDER BY created_at DESC LIMIT 1
+    """,
+}
+
+# Postgres connection pool, or the shared SQLite connection (opened on first use)
+_POOL = None
+_CONN = None
+_DB_TYPE = None
+_DB_LOCK = threading.RLock()
+# Statements and JSON encode/decode for the open backend (set by _open_database)
+_SELECT_SQL = None
+_UPSERT_SQL = None
+_encode_json = None
+_decode_json = None
+
+def _open_database():
+    """Open the Postgres pool or the SQLite connection - PostgreSQL or SQLite fallback"""
+    global _POOL, _CONN, _DB_TYPE, _SELECT_SQL, _UPSERT_SQL, _encode_json, _decode_json
     database_url = os.getenv("DATABASE_URL")
 
     # Try PostgreSQL first
     if database_url and database_url.startswith("postgres"):
         try:
-            import psycopg2
-            conn = psycopg2.connect(database_url)
-            return conn, "postgres"
+            from psycopg2.extras import Json
+            from psycopg2.pool import ThreadedConnectionPool
+            _POOL = ThreadedConnectionPool(minconn=1, maxconn=10, dsn=database_url)
+            _DB_TYPE = "postgres"
+            _SELECT_SQL = SELECT_JSON_SQL["postgres"]
+            _UPSERT_SQL = UPSERT_JSON_SQL["postgres"]
+            # Json() adapts the dict straight to JSONB; reads usually come back
+            # parsed, but a TEXT column or a driver without the jsonb typecaster
+            # returns str/bytes
+            _encode_json = lambda data: Json(data, dumps=_dumps)
+            _decode_json = lambda value: value if isinstance(value, dict) else _loads(value)
+            return
         except ImportError:
             logger.warning("psycopg2 not installed, falling back to SQLite")
         except Exception as e:
             logger.warning(f"PostgreSQL connection failed: {e}, falling back to SQLite")
 
-    # Fallback to SQLite
-    data_dir = os.getenv("DATA_DIR", ".")
-    db_path = os.path.join(data_dir, "biggie.db")
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    return conn, "sqlite"
+    # Fallback to SQLite, on the same volume as the JSON files (imported here,
+    # not at the top: verification imports this module)
+    from verification import DATA_DIR
+    db_path = os.path.join(DATA_DIR, "biggie.db")
+    _CONN = sqlite3.connect(db_path, check_same_thread=False)
+    _configure_sqlite(_CONN, db_path)
+    _DB_TYPE = "sqlite"
+    _SELECT_SQL = SELECT_JSON_SQL["sqlite"]
+    _UPSERT_SQL = UPSERT_JSON_SQL["sqlite"]
+    _encode_json = _dumps
+    _decode_json = _loads
+
+@contextmanager
+def db_connection():
+    """
+    Yield (conn, db_type): a pooled Postgres connection or the shared SQLite one.
+    The database is opened and the table created on first use.
+    """
+    with _DB_LOCK:
+        if _DB_TYPE is None:
+            _open_database()
+            with db_connection() as (conn, db_type):
+                cursor = conn.cursor()
+                cursor.execute(JSON_STORAGE_DDL[db_type])
+                cursor.execute(VERIFICATION_LINKS_DDL)
+                cursor.execute(VERIFICATION_LINKS_INDEX_DDL)
+                conn.commit()
+
+    if _POOL is not None:
+        conn = _POOL.getconn()
+        try:
+            yield conn, "postgres"
+        except Exception:
+            _rollback(conn)
+            raise
+        finally:
+            # Broken connections are discarded instead of going back to the pool
+            _POOL.putconn(conn, close=bool(conn.closed))
+    else:
+        # One SQLite connection: serialize transactions across threads
+        with _DB_LOCK:
+            try:
+                yield _CONN, "sqlite"
+            except Exception:
+                _rollback(_CONN)
+                raise
 
-def load_json_from_db(table_name):
-    """Load JSON data from database table"""
+def _rollback(conn):
+    """Roll back a failed transaction so the connection stays usable"""
     try:
-        conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-
-        # Create table if not exists first (CRITICAL FIX)
-        if db_type == "postgres":
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS json_storage (
-                    table_name VARCHAR(50) PRIMARY KEY,
-                    json_data JSONB NOT NULL,
-                    updated_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-            conn.commit()
-        else:  # sqlite
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS json_storage (
-                    table_name TEXT PRIMARY KEY,
-                    json_data TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        conn.rollback()
+    except Exception:
+        pass
+
+def close_db_connection():
+    """Close the pool / shared connection (registered with atexit)"""
+    global _POOL, _CONN, _DB_TYPE
+    with _DB_LOCK:
+        try:
+            if _POOL is not None:
+                _POOL.closeall()
+            if _CONN is not None:
+                _CONN.close()
+        except Exception:
+            pass
+        _POOL, _CONN, _DB_TYPE = None, None, None
+
+atexit.register(close_db_connection)
+
+# Parsed tables cached per process (table_name -> (loaded_at, data)); saves refresh the entry
+CACHE_TTL = 60
+_cache = {}
+
+def load_json_from_db(table_name, fresh=False):
+    """Load JSON data from database table
+
+    fresh=True skips the CACHE_TTL cache: read-modify-write callers must see
+    rows the other service (bot or cron) wrote in the meantime.
+    """
+    cached = None if fresh else _cache.get(table_name)
+    if cached and time.monotonic() - cached[0] < CACHE_TTL:
+        # Callers mutate what they load, so never hand out the cached object
+        return copy.deepcopy(cached[1])
+
+    try:
+        with db_connection() as (conn, _):
+            cursor = conn.cursor()
+
+            # Simple key-value storage für JSON files
+            cursor.execute(_SELECT_SQL, (table_name,))
+            result = cursor.fetchone()
+            # End the read transaction so the next read sees fresh data
             conn.commit()
 
-        # Simple key-value storage für JSON files
-        if db_type == "postgres":
-            cursor.execute("SELECT json_data FROM json_storage WHERE table_name = %s", (table_name,))
-        else:  # sqlite
-            cursor.execute("SELECT json_data FROM json_storage WHERE table_name = ?", (table_name,))
-
-        result = cursor.fetchone()
-        conn.close()
-
-        if result:
-            # FIX: Handle both string and dict returns from PostgreSQL
-            data = result[0]
-            if isinstance(data, dict):
-                return data  # Already parsed by PostgreSQL JSONB
-            elif isinstance(data, str):
-                return json.loads(data)  # Parse JSON string
-            else:
-                # Handle other types (bytes, etc.)
-                return json.loads(str(data))
-        return {}
+            data = _decode_json(result[0]) if result else {}
+
+        _cache[table_name] = (time.monotonic(), copy.deepcopy(data))
+        return data
 
     except Exception as e:
         logger.error(f"Database load error for {table_name}: {e}")
         return {}
 
+def _upsert_json(cursor, table_name, data):
+    """Write one table's JSON document (caller commits)"""
+    cursor.execute(_UPSERT_SQL, (table_name, _encode_json(data)))
+
 def save_json_to_db(table_name, data):
     """Save JSON data to database table"""
     try:
-        conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-
-        # Create table if not exists (compatible with both PostgreSQL and SQLite)
-        if db_type == "postgres":
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS json_storage (
-                    table_name VARCHAR(50) PRIMARY KEY,
-                    json_data JSONB NOT NULL,
-                    updated_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-        else:  # sqlite
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS json_storage (
-                    table_name TEXT PRIMARY KEY,
-                    json_data TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-        # Upsert operation (compatible syntax)
-        if db_type == "postgres":
-            # FIX: Pass data as dict, not JSON string for JSONB
-            cursor.execute("""
-                INSERT INTO json_storage (table_name, json_data)
-                VALUES (%s, %s)
-                ON CONFLICT (table_name)
-                DO UPDATE SET
-                    json_data = EXCLUDED.json_data,
-                    updated_at = NOW()
-            """, (table_name, json.dumps(data)))  # Still use json.dumps for consistency
-        else:  # sqlite
-            cursor.execute("""
-                INSERT INTO json_storage (table_name, json_data)
-                VALUES (?, ?)
-                ON CONFLICT (table_name)
-                DO UPDATE SET
-                    json_data = excluded.json_data,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (table_name, json.dumps(data)))
-
-        conn.commit()
-        conn.close()
+        with db_connection() as (conn, _):
+            _upsert_json(conn.cursor(), table_name, data)
+            conn.commit()
+
+        _cache[table_name] = (time.monotonic(), copy.deepcopy(data))
         return True
 
     except Exception as e:
         logger.error(f"Database save error for {table_name}: {e}")
         return False
 
-def load_json_file(file_path):
+def save_verification_link(token, group_id):
+    """Store one verification token -> group mapping"""
+    try:
+        with db_connection() as (conn, db_type):
+            conn.cursor().execute(INSERT_LINK_SQL[db_type], (token, group_id, int(time.time())))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Database save error for verification link: {e}")
+        return False
+
+def save_verification_links(links):
+    """Store many token -> group mappings in one transaction (legacy migration)"""
+    now = int(time.time())
+    try:
+        with db_connection() as (conn, db_type):
+            conn.cursor().executemany(
+                INSERT_LINK_SQL[db_type],
+                [(token, str(group_id), now) for token, group_id in links.items()],
+            )
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Database save error for verification links: {e}")
+        return False
+
+def get_verification_link(token):
+    """Look up the group ID for a verification token (None if unknown)"""
+    try:
+        with db_connection() as (conn, db_type):
+            cursor = conn.cursor()
+            cursor.execute(SELECT_LINK_SQL[db_type], (token,))
+            row = cursor.fetchone()
+            conn.commit()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Database load error for verification link: {e}")
+        return None
+
+def get_group_link_token(group_id):
+    """Look up the newest verification token stored for a group (None if none)"""
+    try:
+        with db_connection() as (conn, db_type):
+            cursor = conn.cursor()
+            cursor.execute(SELECT_GROUP_TOKEN_SQL[db_type], (str(group_id),))
+            row = cursor.fetchone()
+            conn.commit()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Database load error for verification link: {e}")
+        return None
+
+def load_json_file(file_path, fresh=False):
     """
     Load JSON - Database version with file fallback
     SICHERE MIGRATION: Funktioniert mit oder ohne Database
+    fresh=True bypasses the database read cache (see load_json_from_db).
     """
     # Check if we have database connection
     if os.getenv("DATABASE_URL"):
         # Extract table name from file path
         table_name = os.path.basename(file_path).replace('.json', '')
         logger.info(f"Loading {table_name} from database")
-        return load_json_from_db(table_name)
+        return load_json_from_db(table_name, fresh=fresh)
     else:
         # Fallback to original file system logic
         logger.info(f"Loading from file: {file_path}")
         if os.path.exists(file_path):
             try:
-                with open(file_path, "r") as f:
-                    return json.load(f)
+                with open(file_path, "rb") as f:
+                    return _loads(f.read())
             except Exception as e:
                 logger.error(f"Error loading {file_path}: {e}")
                 return {}
@@ -175,7 +393,7 @@ def save_json_file(file_path, data):
         logger.info(f"Saving to file: {file_path}")
         try:
             with open(file_path, "w") as f:
-                json.dump(data, f, indent=2)
+                f.write(_dumps(data, pretty=True))
             return True
         except Exception as e:
             logger.error(f"Error saving {file_path}: {e}")
@@ -205,28 +423,44 @@ def migrate_files_to_database():
 
     print("🔄 Starting migration from files to database...")
 
-    for filename in files_to_migrate:
+    def read_file(filename):
+        """Load one JSON file -> (filename, data or None, error or None)"""
         file_path = os.path.join(data_dir, filename)
+        if not os.path.exists(file_path):
+            return filename, None, None
+        try:
+            with open(file_path, "rb") as f:
+                return filename, _loads(f.read()), None
+        except Exception as e:
+            return filename, None, e
 
-        if os.path.exists(file_path):
-            print(f"📁 Migrating {filename}...")
+    # Read and parse all files in parallel
+    with ThreadPoolExecutor(max_workers=len(files_to_migrate)) as pool:
+        loaded = list(pool.map(read_file, files_to_migrate))
 
-            # Load from file
-            try:
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-
-                # Save to database
-                table_name = filename.replace('.json', '')
-                if save_json_to_db(table_name, data):
-                    print(f"✅ {filename} migrated successfully")
+    # Write everything in a single transaction
+    migrated = []
+    try:
+        with db_connection() as (conn, _):
+            cursor = conn.cursor()
+            for filename, data, error in loaded:
+                if error is not None:
+                    print(f"❌ Error migrating {filename}: {error}")
+                elif data is None:
+                    print(f"⏭️ {filename} not found, skipping")
                 else:
-                    print(f"❌ Failed to migrate {filename}")
+                    print(f"📁 Migrating {filename}...")
+                    table_name = filename.replace('.json', '')
+                    _upsert_json(cursor, table_name, data)
+                    migrated.append((filename, table_name, data))
+            conn.commit()
+    except Exception as e:
+        print(f"❌ Migration failed, nothing was written: {e}")
+        return
 
-            except Exception as e:
-                print(f"❌ Error migrating {filename}: {e}")
-        else:
-            print(f"⏭️ {filename} not found, skipping")
+    for filename, table_name, data in migrated:
+        _cache[table_name] = (time.monotonic(), copy.deepcopy(data))
+        print(f"✅ {filename} migrated successfully")
 
     print("✅ Migration completed!")
 
@@ -3,70 +3,87 @@
 WenPadGateBot - Railway Optimized Version
 """
 
-print("🔄 Starting imports...")
+import sys
+
+# Startup banner lines, written to stdout in one go once the checks below are done
+_boot_lines = ["🔄 Starting imports..."]
 try:
     import logging
     import json
     import os
     import asyncio
-    import re
-    import pprint
     import secrets
     import time
-    print("✅ Basic imports successful")
-
-    from moralis import evm_api
-    import aiohttp
-    print("✅ API imports successful")
+    from itertools import islice
+    from dataclasses import dataclass
+    from typing import Callable
+    _boot_lines.append("✅ Basic imports successful")
 
-    from verify_cron import verify_all_members
-    from datetime import datetime, timezone, timedelta
-    from collections import deque
-    from typing import Dict, Any
-    print("✅ Utility imports successful")
+    from verify_cron import verify_groups
+    from cachetools import TTLCache
+    _boot_lines.append("✅ Utility imports successful")
 
-    from telegram import Update, ChatMember, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
+    from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
     from telegram.ext import (
         Application,
-        CommandHandler,
         ContextTypes,
         MessageHandler,
         filters,
-        CallbackContext,
         CallbackQueryHandler
     )
-    print("✅ Telegram imports successful")
+    from telegram.error import RetryAfter
+    _boot_lines.append("✅ Telegram imports successful")
 
 except ImportError as e:
+    print("\n".join(_boot_lines))
     print(f"💥 IMPORT ERROR: {e}")
     print("📦 Missing dependency - check requirements.txt")
     exit(1)
 except Exception as e:
+    print("\n".join(_boot_lines))
     print(f"💥 UNEXPECTED IMPORT ERROR: {e}")
     import traceback
     traceback.print_exc()
     exit(1)
 
-print("✅ All imports completed successfully")
+_boot_lines.append("✅ All imports completed successfully")
 
 
 # Import verification functions from verification module
 from verification import (
-    load_json_file, save_json_file, is_owner, get_token_from_env,
-    track_rejection, is_group_blocked,
+    load_json_file, cached_load_json, save_json_file, is_owner, get_token_from_env,
     get_rejection_count, reset_rejection_count, get_blocked_groups,
-    get_all_rejections, is_group_whitelisted, whitelist_group,
-    add_pending_whitelist, remove_pending_whitelist,
-    CONFIG_PATH, USER_DATA_PATH, WHITELIST_PATH, PENDING_WHITELIST_PATH,
-    REJECTED_GROUPS_PATH
+    get_all_rejections, get_whitelist, get_pending_whitelist,
+    add_pending_whitelist, approve_pending_whitelist, reject_pending_whitelist,
+    load_user_data_for_group, save_user_data_for_group, group_user_data_path,
+    migrate_user_data, migrate_admin_state,
+    CONFIG_PATH,
 )
 
 # Import blockchain functions from blockchain_integrations module
 from blockchain_integrations import (
-    verify_user_balance, check_token_transfer_moralis, get_token_decimals,
+    verify_user_balance, check_token_transfer_once,
     is_valid_solana_address, get_token_balance_moralis, get_token_balance_rpc,
+    aclose as close_http_session,
 )
 
+# Verification links live in an indexed table (Postgres, or SQLite in DATA_DIR)
+from database_simple import (
+    save_verification_link, save_verification_links, get_verification_link, get_group_link_token,
+)
+
+# orjson (C extension) when available, stdlib json otherwise
+try:
+    import orjson
+
+    def _pretty_json(data):
+        """Serialize to indented JSON text"""
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    def _pretty_json(data):
+        """Serialize to indented JSON text"""
+        return json.dumps(data, indent=2)
+
 
 # Get tokens and admin user ID
 TOKEN, MORALIS_API_KEY, ETHERSCAN_API_KEY = get_token_from_env()
@@ -75,62 +92,69 @@ ADMIN_USER_ID = os.getenv("ADMIN_USER_ID", "1825755152")
 # Support Railway persistent volume via DATA_DIR (from verification module)
 from verification import DATA_DIR
 
-print("🔍 Token check results:")
-print(f"- TELEGRAM_BOT_TOKEN: {'✅ Found' if TOKEN else '❌ Missing'}")
-print(f"- MORALIS_API_KEY: {'✅ Found' if MORALIS_API_KEY else '❌ Missing'}")
-print(f"- ETHERSCAN_API_KEY: {'✅ Found' if ETHERSCAN_API_KEY else '❌ Missing'}")
+_boot_lines += [
+    "🔍 Token check results:",
+    f"- TELEGRAM_BOT_TOKEN: {'✅ Found' if TOKEN else '❌ Missing'}",
+    f"- MORALIS_API_KEY: {'✅ Found' if MORALIS_API_KEY else '❌ Missing'}",
+    f"- ETHERSCAN_API_KEY: {'✅ Found' if ETHERSCAN_API_KEY else '❌ Missing'}",
+]
 
 if not TOKEN:
-    print("ERROR: TELEGRAM_BOT_TOKEN is required but missing!")
-    print("Available env vars with 'TOKEN' or 'API':", [k for k in os.environ.keys() if 'TOKEN' in k or 'API' in k])
-    print("All env vars:", list(os.environ.keys())[:10], "..." if len(os.environ) > 10 else "")
-    print("Continuing with limited functionality...")
+    _boot_lines += [
+        "ERROR: TELEGRAM_BOT_TOKEN is required but missing!",
+        f"Available env vars with 'TOKEN' or 'API': {[k for k in os.environ.keys() if 'TOKEN' in k or 'API' in k]}",
+        f"All env vars: {list(os.environ.keys())[:10]} {'...' if len(os.environ) > 10 else ''}",
+        "Continuing with limited functionality...",
+    ]
     # Don't exit - let's see what else breaks
 
-print("✅ Environment check passed:")
-print(f"- TELEGRAM_BOT_TOKEN: {'✅ Set' if TOKEN else '❌ Missing'}")
-print(f"- MORALIS_API_KEY: {'✅ Set' if MORALIS_API_KEY else '❌ Missing'}")
-print(f"- ETHERSCAN_API_KEY: {'✅ Set' if ETHERSCAN_API_KEY else '❌ Missing'}")
-print(f"- DATA_DIR: {DATA_DIR}")
-print(f"- ADMIN_USER_ID: {ADMIN_USER_ID}")
+_boot_lines += [
+    "✅ Environment check passed:",
+    f"- TELEGRAM_BOT_TOKEN: {'✅ Set' if TOKEN else '❌ Missing'}",
+    f"- MORALIS_API_KEY: {'✅ Set' if MORALIS_API_KEY else '❌ Missing'}",
+    f"- ETHERSCAN_API_KEY: {'✅ Set' if ETHERSCAN_API_KEY else '❌ Missing'}",
+    f"- DATA_DIR: {DATA_DIR}",
+    f"- ADMIN_USER_ID: {ADMIN_USER_ID}",
+]
 
 # Railway 2025 debugging - check volume mount
-print(f"🔍 Volume diagnostics:")
-print(f"- DATA_DIR exists: {os.path.exists(DATA_DIR)}")
-print(f"- DATA_DIR writable: {os.access(DATA_DIR, os.W_OK) if os.path.exists(DATA_DIR) else 'N/A'}")
-print(f"- Current working dir: {os.getcwd()}")
-print(f"- /app exists: {os.path.exists('/app')}")
-print(f"- /app/data exists: {os.path.exists('/app/data')}")
+_boot_lines += [
+    "🔍 Volume diagnostics:",
+    f"- DATA_DIR exists: {os.path.exists(DATA_DIR)}",
+    f"- DATA_DIR writable: {os.access(DATA_DIR, os.W_OK) if os.path.exists(DATA_DIR) else 'N/A'}",
+    f"- Current working dir: {os.getcwd()}",
+    f"- /app exists: {os.path.exists('/app')}",
+    f"- /app/data exists: {os.path.exists('/app/data')}",
+]
 
 # Try to create DATA_DIR if it doesn't exist
 if not os.path.exists(DATA_DIR):
     try:
         os.makedirs(DATA_DIR, exist_ok=True)
-        print(f"✅ Created DATA_DIR: {DATA_DIR}")
+        _boot_lines.append(f"✅ Created DATA_DIR: {DATA_DIR}")
     except Exception as e:
-        print(f"❌ Failed to create DATA_DIR: {e}")
+        _boot_lines.append(f"❌ Failed to create DATA_DIR: {e}")
         # Don't exit - continue with current directory
         DATA_DIR = "."
-        print(f"🔄 Falling back to current directory: {DATA_DIR}")
+        _boot_lines.append(f"🔄 Falling back to current directory: {DATA_DIR}")
 
 if not MORALIS_API_KEY:
-    print("WARNING: MORALIS_API_KEY not found in .env file. Using fallback RPC method.")
+    _boot_lines.append("WARNING: MORALIS_API_KEY not found in .env file. Using fallback RPC method.")
+
+sys.stdout.write("\n".join(_boot_lines) + "\n")
+sys.stdout.flush()
+del _boot_lines
 
 # Additional file paths not in verification module
 VERIFICATION_LINKS_PATH = os.path.join(DATA_DIR, "verification_links.json")
 VERIFICATION_INTERVAL = 23000  # Checks every 16.6 minutes
 
-# Configure logging
+# Configure logging (INFO by default; LOG_LEVEL=DEBUG/WARNING/... overrides it)
+# force: replace any handler an imported module already installed on the root logger
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    force=True,
 )
 logger = logging.getLogger(__name__)
 
@@ -141,12 +165,149 @@ logging.getLogger("telegram").setLevel(logging.WARNING)
 logging.getLogger("telegram.ext").setLevel(logging.INFO)
 
 
-# Store setup sessions and verification sessions
-setup_sessions = {}
-verification_sessions = {}
+# Store setup sessions and verification sessions (both keyed by user_id;
+# a verification session carries its group_id)
+# (abandoned sessions are evicted after SESSION_TTL seconds)
+SESSION_TTL = 1800
+setup_sessions = TTLCache(maxsize=10_000, ttl=SESSION_TTL)
+verification_sessions = TTLCache(maxsize=10_000, ttl=SESSION_TTL)
+
+# Groups blocked under the 3-strike policy; seeded in post_init and kept in step
+# with reject_pending_whitelist / reset_rejection_count, so the per-message check is a set lookup
+_blocked_groups = set()
+
+# Whitelisted groups, likewise seeded in post_init and extended by approve_pending_whitelist
+_whitelisted_groups = set()
+
+# Single-use invite links expire this many seconds after creation
+INVITE_LINK_TTL = 600
+
+# Serializes user_data read-modify-write cycles across concurrent verifications
+_user_data_lock = asyncio.Lock()
+
+# Debounced user_data writes: a burst of verifications collapses into one save
+# per touched group (group_id -> that group's members, waiting to be written)
+USER_DATA_DEBOUNCE = 0.5
+_pending_user_data = {}
+_user_data_flush_task = None
+
+async def load_user_data(group_id):
+    """Read-only members of a group, including updates still waiting for the debounced writer."""
+    group_users = _pending_user_data.get(group_id)
+    if group_users is not None:
+        return group_users
+    return await asyncio.to_thread(cached_load_json, group_user_data_path(group_id))
+
+async def load_user_data_for_update(group_id):
+    """A group's members to modify and pass to schedule_user_data_save (hold _user_data_lock)."""
+    group_users = _pending_user_data.get(group_id)
+    if group_users is not None:
+        return group_users
+    return await asyncio.to_thread(load_user_data_for_group, group_id)
+
+def schedule_user_data_save(group_id, group_users):
+    """Queue a group's members for writing after USER_DATA_DEBOUNCE (hold _user_data_lock)."""
+    global _user_data_flush_task
+    _pending_user_data[group_id] = group_users
+    # Updated in place, so the group's wallet index must be rebuilt
+    _addr_index.pop(group_id, None)
+    if _user_data_flush_task is None or _user_data_flush_task.done():
+        _user_data_flush_task = asyncio.create_task(flush_user_data(USER_DATA_DEBOUNCE))
+
+async def flush_user_data(delay=0):
+    """Write the queued groups' members, if any, after `delay` seconds."""
+    global _pending_user_data
+    await asyncio.sleep(delay)
+    async with _user_data_lock:
+        pending, _pending_user_data = _pending_user_data, {}
+        for group_id, group_users in pending.items():
+            await asyncio.to_thread(save_user_data_for_group, group_id, group_users)
+
+# Transfer checks (slow RPC scans) run on worker tasks instead of inside the
+# handlers; a user's checks always go to the same worker, so they run in order
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", "4"))
+_transfer_queues = []
+_transfer_workers = []
+
+async def _transfer_worker(queue):
+    """Run queued transfer-check jobs one at a time."""
+    while True:
+        job = await queue.get()
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Transfer check failed: {e}")
+        finally:
+            queue.task_done()
+
+def start_transfer_workers():
+    """Start the transfer-check workers (called from post_init)."""
+    for _ in range(TRANSFER_WORKERS):
+        queue = asyncio.Queue(maxsize=1000)
+        _transfer_queues.append(queue)
+        _transfer_workers.append(asyncio.create_task(_transfer_worker(queue)))
+
+async def stop_transfer_workers():
+    """Cancel the transfer-check workers (called from post_shutdown)."""
+    for task in _transfer_workers:
+        task.cancel()
+    await asyncio.gather(*_transfer_workers, return_exceptions=True)
+    _transfer_workers.clear()
+    _transfer_queues.clear()
+
+async def enqueue_transfer_check(user_id, job):
+    """Queue a transfer-check coroutine function on the user's worker."""
+    await _transfer_queues[user_id % len(_transfer_queues)].put(job)
+
+async def enqueue_session_transfer_check(user_id, session, check):
+    """Queue a session's transfer check; the session stays "checking_transfer" until it has run.
+
+    While a check is queued or running, further "done" messages and retry taps
+    are turned away instead of queueing duplicate scans.
+    """
+    session["step"] = "checking_transfer"
+
+    async def job():
+        try:
+            await check()
+        finally:
+            # Back to waiting for "done"/retry, unless the check ended the session
+            if verification_sessions.get(user_id) is session and session["step"] == "checking_transfer":
+                session["step"] = "awaiting_transfer"
+
+    await enqueue_transfer_check(user_id, job)
 
 # Bot username (will be set after bot starts)
 BOT_USERNAME = None
+# Deep link for a verification token; rebuilt once BOT_USERNAME is known
+_LINK_TMPL = "https://t.me/wenpadgatebot?start={}"
+
+# Caps concurrent outgoing messages so fan-outs stay under Telegram's flood limits
+TG_SEND_SEM = asyncio.Semaphore(20)
+
+async def _send(bot, chat_id, text, **kwargs):
+    """send_message bounded by TG_SEND_SEM; waits out one RetryAfter flood limit and retries."""
+    async with TG_SEND_SEM:
+        try:
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+
+async def _notify_group(bot, group_id, text, ack):
+    """Send a Markdown notice to a group concurrently with the owner-side ack.
+
+    A failed notice is only logged; a failed ack is raised.
+    """
+    notified, acked = await asyncio.gather(
+        _send(bot, chat_id=group_id, text=text, parse_mode="Markdown"),
+        ack,
+        return_exceptions=True,
+    )
+    if isinstance(acked, Exception):
+        raise acked
+    if isinstance(notified, Exception):
+        logger.error("Error notifying group %s: %s", group_id, notified)
 
 # ---------------------------------------------
 # Utility Functions (additional to verification module)
@@ -156,6 +317,40 @@ def is_admin(member):
     return member.status in ["administrator", "creator"]
 
 
+# group_id -> Chat; titles and ids barely change, so one get_chat per group per TTL
+_chat_cache = TTLCache(maxsize=1024, ttl=300)
+
+async def get_chat_cached(bot, chat_id):
+    """bot.get_chat with a 5-minute in-process cache (invite links are still created per call)."""
+    chat = _chat_cache.get(chat_id)
+    if chat is None:
+        chat = await bot.get_chat(chat_id)
+        _chat_cache[chat_id] = chat
+    return chat
+
+async def is_chat_admin(bot, chat_id, user_id):
+    """Whether user_id administers chat_id (always asks Telegram, so demotions apply at once)."""
+    member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+    return is_admin(member)
+
+
+# group_id -> (that group's members dict, {address.lower(): user_ids of verified members}).
+# Addresses stay stored as entered (base58 is case-sensitive); the index is
+# rebuilt whenever the loaded members dict changes.
+_addr_index = {}
+
+def is_wallet_taken(group_users, group_id, address, user_id):
+    """Check if another verified member of the group already uses this wallet (case-insensitive)."""
+    entry = _addr_index.get(group_id)
+    if entry is None or entry[0] is not group_users:
+        index = {}
+        for uid, rec in group_users.items():
+            if rec.get("verified", False) is True:
+                index.setdefault(rec.get("address", "").lower(), []).append(uid)
+        entry = _addr_index[group_id] = (group_users, index)
+    return any(uid != str(user_id) for uid in entry[1].get(address.lower(), ()))
+
+
 def is_valid_float(value):
     """Check if value is a valid float."""
     try:
@@ -171,30 +366,65 @@ def is_valid_float(value):
 # ---------------------------------------------
 # Verification Link Management
 # ---------------------------------------------
-def generate_verification_link(group_id):
-    """Generate a unique verification link for a group."""
-    global BOT_USERNAME
-    verification_links = load_json_file(VERIFICATION_LINKS_PATH)
-    
-    # Generate a unique token
-    token = secrets.token_urlsafe(16)
-    
-    # Store the link mapping
-    verification_links[token] = group_id
-    
-    # Save to file
-    save_json_file(VERIFICATION_LINKS_PATH, verification_links)
+# token -> group_id, seeded once from the legacy verification_links.json and
+# filled by new links and table lookups, so /start <token> is a dict hit
+_LINKS = load_json_file(VERIFICATION_LINKS_PATH) or {}
+
+def migrate_verification_links():
+    """One-time copy of the legacy verification_links.json into the verification_links table.
+
+    Afterwards the legacy file is renamed to verification_links.json.migrated
+    (emptied in the database). Returns how many links were migrated.
+    """
+    links = load_json_file(VERIFICATION_LINKS_PATH)
+    if not links:
+        return 0
+    if not save_verification_links(links):
+        logger.error(f"Migrating verification links failed; keeping {VERIFICATION_LINKS_PATH}")
+        return 0
+    if os.getenv("DATABASE_URL"):
+        save_json_file(VERIFICATION_LINKS_PATH, {})
+    else:
+        os.replace(VERIFICATION_LINKS_PATH, f"{VERIFICATION_LINKS_PATH}.migrated")
+    logger.info(f"Moved {len(links)} verification links into the database")
+    return len(links)
+
+# group_id -> the group's current link token; /status, setup and join notices
+# reuse it (also across restarts, via the newest stored row) instead of storing
+# a new token on every call, which keeps it exempt from the link GC
+_group_link_tokens = {}
+
+async def generate_verification_link(group_id):
+    """Generate a unique verification link for a group (None if it could not be stored)."""
+    token = _group_link_tokens.get(group_id)
+    if token is None:
+        token = await asyncio.to_thread(get_group_link_token, group_id)
+        if token is not None:
+            _group_link_tokens[group_id] = token
+            _LINKS[token] = group_id
+    if token is None:
+        # Generate a unique token
+        token = secrets.token_urlsafe(16)
+        
+        # Store the link mapping (one indexed row, no full-file rewrite)
+        if not await asyncio.to_thread(save_verification_link, token, group_id):
+            # An unsaved token would only ever resolve to "invalid link"
+            logger.error(f"Could not store a verification link for group {group_id}")
+            return None
+        _group_link_tokens[group_id] = token
+        _LINKS[token] = group_id
     
     # Return the deep link URL with bot username
-    if BOT_USERNAME:
-        return f"https://t.me/{BOT_USERNAME}?start={token}"
-    else:
-        return f"https://t.me/wenpadgatebot?start={token}"
+    return _LINK_TMPL.format(token)
 
-def get_group_from_token(token):
+async def get_group_from_token(token):
     """Get group ID from verification token."""
-    verification_links = load_json_file(VERIFICATION_LINKS_PATH)
-    return verification_links.get(token)
+    group_id = _LINKS.get(token)
+    if group_id is None:
+        group_id = await asyncio.to_thread(get_verification_link, token)
+        if group_id is not None:
+            _LINKS[token] = group_id
+    return group_id
 
 # Web3 verification functions are now imported from verification module
 
@@ -214,14 +444,14 @@ async def start_setup_flow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     group_name = update.message.chat.title or f"Group {group_id}"
 
     # ✅ Step 0: Check if group is blocked (3-strike policy)
-    if is_group_blocked(group_id):
+    if group_id in _blocked_groups:
         # Ignore all input from blocked groups - don't respond
         return
 
     # ✅ Step 1: Check admin/owner FIRST - block normal members immediately
+    # (the owner needs no get_chat_member round-trip)
     try:
-        member = await context.bot.get_chat_member(chat_id=group_id, user_id=user_id)
-        if not is_admin(member) and not is_owner(user_id):
+        if not is_owner(user_id) and not await is_chat_admin(context.bot, group_id, user_id):
             await update.message.reply_text("❌ Only group admins can run /setup.")
             return
     except Exception as e:
@@ -230,9 +460,9 @@ async def start_setup_flow(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # ✅ Step 2: Whitelist check (only for admins/owner that passed above)
-    if not is_owner(user_id) and not is_group_whitelisted(group_id):
+    if not is_owner(user_id) and group_id not in _whitelisted_groups:
         admin_name = update.message.from_user.full_name or f"User {user_id}"
-        add_pending_whitelist(group_id, group_name, user_id, admin_name)
+        await asyncio.to_thread(add_pending_whitelist, group_id, group_name, user_id, admin_name)
 
         await update.message.reply_text(
             "🔄 *Whitelist Request Sent* 🔄\n\n"
@@ -269,7 +499,7 @@ async def start_setup_flow(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # ✅ Step 3: Continue with setup (or confirm overwrite)
-    config = load_json_file(CONFIG_PATH)
+    config = await asyncio.to_thread(load_json_file, CONFIG_PATH)
     if group_id in config:
         await update.message.reply_text(
             "This group already has a configuration. Starting a new setup will overwrite it.\n"
@@ -303,14 +533,14 @@ async def handle_setup_response(update: Update, context: ContextTypes.DEFAULT_TY
     # Check if this is a group and if group is blocked (3-strike policy)
     if update.message.chat.type in ["group", "supergroup"]:
         group_id = str(update.message.chat_id)
-        if is_group_blocked(group_id):
+        if group_id in _blocked_groups:
             # Ignore all input from blocked groups - don't respond
             return
 
-    if user_id not in setup_sessions:
+    session = setup_sessions.get(user_id)
+    if session is None:
         return  # Not in setup flow
     
-    session = setup_sessions[user_id]
     step = session["step"]
     group_id = session["group_id"]
     
@@ -319,7 +549,7 @@ async def handle_setup_response(update: Update, context: ContextTypes.DEFAULT_TY
             await ask_chain(update, user_id, group_id)
         else:
             await update.message.reply_text("Setup cancelled.")
-            del setup_sessions[user_id]
+            setup_sessions.pop(user_id, None)
     
     elif step == "chain":
         if message_text != "sol":
@@ -362,12 +592,16 @@ async def complete_setup(update: Update, user_id: int, group_id: int):
     config_data = session["data"]
     
     # Save configuration
-    config = load_json_file(CONFIG_PATH)
+    config = dict(await asyncio.to_thread(cached_load_json, CONFIG_PATH))
     config[group_id] = config_data
     
-    if save_json_file(CONFIG_PATH, config):
+    if await asyncio.to_thread(save_json_file, CONFIG_PATH, config):
         # Generate verification link
-        verification_link = generate_verification_link(group_id)
+        verification_link = await generate_verification_link(group_id)
+        if verification_link is None:
+            link_text = _LINK_UNAVAILABLE_MSG
+        else:
+            link_text = f"Share this verification link with your members:\n{verification_link}"
         
         await update.message.reply_text(
             "✅ Setup completed!\n\n"
@@ -375,8 +609,7 @@ async def complete_setup(update: Update, user_id: int, group_id: int):
             f"• Token: {config_data['token']}\n"
             f"• Min Balance: {config_data['min_balance']}\n"
             f"• Verifier: {config_data['verifier']}\n\n"
-            "Share this verification link with your members:\n"
-            f"{verification_link}\n\n"
+            f"{link_text}\n\n"
             "Users must verify BEFORE joining the group. "
             "They will receive an invite link after successful verification."
         )
@@ -384,7 +617,253 @@ async def complete_setup(update: Update, user_id: int, group_id: int):
         await update.message.reply_text("Failed to save configuration. Please try again.")
     
     # Clean up session
-    del setup_sessions[user_id]
+    setup_sessions.pop(user_id, None)
+
+# ---------------------------------------------
+# Message Templates
+# ---------------------------------------------
+_APPROVED_MSG = (
+    "✅ **GROUP APPROVED!** ✅\n\n"
+    "Congratulations! Your group '{group_name}' has been approved for the whitelist.\n\n"
+    "**Next Steps:**\n"
+    "1. Use `/setup` in your group to configure token requirements\n"
+    "2. Set the bot as an admin with permission to add/remove members\n"
+    "3. Share the verification link with your members\n\n"
+    "Your group is now ready for token-gated access!"
+)
+
+_BLOCKED_MSG = (
+    "🚫 **GROUP PERMANENTLY BLOCKED** 🚫\n\n"
+    "Your group '{group_name}' has been rejected for the 3rd time and is now permanently blocked.\n\n"
+    "**What this means:**\n"
+    "• Your group can no longer submit whitelist requests\n"
+    "• The bot will ignore all commands from your group\n"
+    "• The bot will ignore all activity in your group\n\n"
+    "If you believe this is an error, contact @rain5966"
+)
+
+_REJECTED_WARN_MSG = (
+    "❌ **Whitelist Request Rejected** ❌\n\n"
+    "Your group '{group_name}' has been rejected.\n\n"
+    "**Strike Count:** {rejection_count}/3\n\n"
+    "⚠️ **Warning:** After 3 rejections, your group will be permanently blocked.\n\n"
+    "You can submit a new whitelist request, but please ensure you meet all requirements. "
+    "Contact @rain5966 for clarification on requirements."
+)
+
+_ADMIN_HELP_MSG = (
+    "👑 *Admin Commands* 👑\n\n"
+    "**Whitelist Management:**\n"
+    "/admin pending - View pending whitelist requests\n"
+    "/admin approve <group_id> - Approve a group\n"
+    "/admin reject <group_id> - Reject a group\n"
+    "/admin list - List all whitelisted groups\n\n"
+    "**3-Strike System Management:**\n"
+    "/admin blocked - List all blocked groups\n"
+    "/admin rejections - Show all groups with rejections\n"
+    "/admin strikes <group_id> - Show rejection count for a group\n"
+    "/admin unblock <group_id> - Reset rejection count and unblock a group"
+)
+
+_VERIFY_WELCOME_MSG = (
+    "🔐 *WenPadGateBot Verification* 🔐\n\n"
+    "Welcome to the token verification process!\n\n"
+    "To join the private group, you must verify your token holdings.\n\n"
+    "Click the button below to enter your wallet address and begin verification."
+)
+
+_VERIFIED_JOIN_MSG = (
+    "✅ <b>Verification Complete!</b>\n\n"
+    "You have successfully verified your token holdings and proven wallet ownership! 🎉\n\n"
+    "Click below to join the group:"
+)
+
+_VERIFIED_NO_LINK_MSG = (
+    "✅ *Verification Complete!* ✅\n\n"
+    "You have successfully verified! 🎉\n\n"
+    "Please contact the group admin for an invite link."
+)
+
+_LINK_UNAVAILABLE_MSG = (
+    "⚠️ The verification link could not be created right now. "
+    "Run /status in a minute to get it."
+)
+
+_TIMED_OUT_MSG = (
+    "❌ *Verification Timed Out* ❌\n\n"
+    "No valid transfer detected within 5 minutes.\n"
+    "Please restart verification using a new link from your group admin."
+)
+
+_STILL_NOT_VERIFIED_MSG = (
+    "❌ *Still Not Verified* ❌\n\n"
+    "The transfer is still not visible.\n"
+    "You still have {remaining} seconds before this session expires.\n\n"
+    "Make sure the transaction is confirmed and you sent exactly 1 token.\n"
+    "Retry after 1 minute if needed."
+)
+
+_TRANSFER_PENDING_MSG = (
+    "❌ *Transfer Not Verified Yet* ❌\n\n"
+    "It can take a few minutes for the blockchain to confirm your transfer.\n"
+    "You still have {remaining} seconds before this session expires.\n\n"
+    "Wait at least a minute, then tap below to try again."
+)
+
+_TRANSFER_CHECKING_MSG = "⏳ Your transfer is still being checked. I'll update you shortly."
+
+_ACCESS_DENIED_MSG = (
+    "❌ *Access Denied* ❌\n\n"
+    "You tried to join a private token-gated group without verification.\n\n"
+    "To join this group, you must:\n"
+    "1. Verify your token holdings first\n"
+    "2. Receive an invite link\n"
+    "3. Then join the group\n\n"
+    "Start verification here: {verification_link}"
+)
+
+_HELP_OWNER_MSG = """
+👑 *Owner Commands* 👑
+/setup - Setup group token rules (bypasses whitelist)
+/admin - Manage whitelist requests
+/status - Check group settings
+/guide - Complete step-by-step guide
+/test_verify - Run verification immediately (testing)
+/testbalance <wallet_address> <token_address>  - Test token balance across APIs
+/dump - dump the config/user data straight into your Telegram DM
+/admin blocked - List all blocked groups
+/admin rejections - Show all groups with rejections
+/admin strikes <group_id> - Show rejection count for a specific group
+/admin unblock <group_id> - Reset rejection count and unblock a group
+/help - Show this help menu
+"""
+
+_HELP_USER_MSG = """
+*Available Commands:*
+
+👨‍💼 *For Group Admins:*
+/setup - Setup your group with token rules
+/status - View current group settings & get verification link
+/testbalance <wallet_address> <token_address> - Test token balance across APIs
+/guide - Complete step-by-step setup guide
+
+👤 *For Members:*
+/guide - How to verify and join private groups
+/help - Show this help menu
+
+*Need help?* Use /guide for complete instructions or contact your group admin.
+"""
+
+_GUIDE_GROUP_MSG = """
+📖 *Complete Admin Guide - WenPadGateBot * 📖
+
+*1. SETUP YOUR GROUP*
+• Create a private group with no other members present
+• Go to user permissions in group settings and only leave Send Text and Media messages, disable the rest
+• Invite @WenPadGateBot and set bot as admin with add and remove members permissions
+
+*2. GET WHITELISTED (First Time Only)*
+• Use `/setup` in your group
+• DM @rain5966 with your request
+• Send a one time fee of 2 SOL to: `8e5jkNeRnkz2HBzqu3fmiWEwv2kSeAMLutQcaqP3UtQ5`
+• Wait for approval notification
+• Use `/setup` after whitelist approved message
+• Follow the interactive setup:
+  - Enter chain (currently only SOL)
+  - Enter token contract address
+  - Enter minimum required balance
+  - Enter verifier wallet address (where users send 1 token to verify wallet ownership)
+
+*3. SHARE VERIFICATION LINK*
+• Use `/status` to get your unique verification link
+• Share this link with your members
+• Members MUST verify BEFORE joining
+
+*4. MEMBER VERIFICATION PROCESS*
+1. Member clicks your verification link
+2. They DM the bot with their wallet address
+3. Bot checks if they hold enough tokens
+4. If yes, they send 1 token to verifier address
+5. Bot verifies the transfer
+6. Member receives instant invite link
+
+*5. AUTOMATIC PROTECTION*
+• Bot automatically removes unverified users
+• Periodic checks ensure members still hold tokens
+• No grace period - verification required first
+
+🔧 *Admin Commands:*
+`/setup` - Configure group requirements
+`/status` - View settings & get verification link
+`/testbalance` - Usage: /testbalance <wallet_address> <token_address>
+`/help` - Show all commands
+
+Need help? Contact @rain5966
+"""
+
+_GUIDE_DM_MSG = """
+📖 *Complete User Guide - WenPadLabsBot, powered by WenPad Labs* 📖
+
+*HOW TO JOIN A PRIVATE GROUP:*
+
+*1. GET VERIFICATION LINK*
+• Ask the group admin for a verification link
+• The link looks like: `t.me/wenpadgatebot?start=AbCdEfGh123456`
+
+*2. START VERIFICATION*
+• Click the verification link
+• You'll be redirected to this bot
+• Tap "Enter Wallet Address" button
+
+*3. PROVIDE WALLET ADDRESS*
+• Send your Solana wallet address
+• Example: 8e5jkNeRnkz2HBzqu3fmiWEwv2kSeAMLutQcaqP3UtQ5
+• Bot will check your token balance
+
+*4. COMPLETE OWNERSHIP PROOF*
+• If you have enough tokens, you'll be asked to:
+• Send exactly **1 token** to the verifier address
+• This proves you own the wallet
+• After sending, type 'done' in this chat
+
+*5. RECEIVE INVITE LINK*
+• Bot will verify your transfer
+• You'll receive a one-time invite link
+• Click the link to join the private group
+
+*IMPORTANT NOTES:*
+🔒 Your wallet address is only used for verification
+⏰ Invite links expire quickly (use immediately)
+🔄 If transfer isn't detected, use "Retry" button
+❌ Don't join the group without verification - you'll be removed
+
+Need help? Contact your group admin.
+
+*BRIEF GROUP ADMIN INSTRUCTIONS*
+*SETUP YOUR GROUP*
+• Create a private group with no other members present
+• Go to user permissions in group settings and only leave Send Text and Media messages, disable the rest
+• Invite @WenPadGateBot and set bot as admin with add and remove members permissions
+• Use `/setup` in your group to get whitelisted
+• Use `/guide` in your group for more detailed admin guide
+
+"""
+
+# Static keyboards are built once and reused for every message
+_ENTER_ADDRESS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📝 Enter Wallet Address", callback_data="enter_address")],
+    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
+])
+
+_RETRY_AGAIN_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔁 Retry Again", callback_data="retry_transfer_check")],
+    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
+])
+
+_RETRY_VERIFICATION_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔁 Retry Verification", callback_data="retry_transfer_check")],
+    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
+])
 
 # ---------------------------------------------
 # Whitelist Management
@@ -402,97 +881,68 @@ async def handle_whitelist_approval(update: Update, context: ContextTypes.DEFAUL
     action, group_id = query.data.split('_', 1)
     
     if action == "approve":
-        # Get group info BEFORE removing from pending
-        pending = load_json_file(PENDING_WHITELIST_PATH)
-        group_info = pending.get(group_id, {})
-        group_name = group_info.get("group_name", f"Group {group_id}")
-        admin_id = group_info.get("admin_id")
-
-        if whitelist_group(group_id):
-            remove_pending_whitelist(group_id)
-
-            # Notify the group directly
-            try:
-                await context.bot.send_message(
-                    chat_id=group_id,
-                    text=(
-                        "✅ **GROUP APPROVED!** ✅\n\n"
-                        f"Congratulations! Your group '{group_name}' has been approved.\n\n"
-                        "**Next Steps:**\n"
-                        "1. Use `/setup` in your group to configure token requirements\n"
-                        "2. Set the bot as an admin with permission to add/remove members\n"
-                        "3. Share the verification link with your members\n\n"
-                        "Your group is now ready for token-gated access!"
-                    ),
-                    parse_mode="Markdown"
-                )
-            except Exception as e:
-                logger.error(f"Error notifying group {group_id}: {e}")
-            
-            await query.edit_message_text(f"✅ Group {group_id} has been whitelisted.")
+        # Whitelist and drop the pending request, keeping its info for the notice
+        saved, group_info = await asyncio.to_thread(approve_pending_whitelist, group_id)
+        if saved:
+            _whitelisted_groups.add(group_id)
+            group_name = group_info.get("group_name", f"Group {group_id}")
+
+            # Notify the group directly while acknowledging the owner
+            await _notify_group(
+                context.bot, group_id,
+                _APPROVED_MSG.format(group_name=group_name),
+                query.edit_message_text(f"✅ Group {group_id} has been whitelisted."),
+            )
         else:
             await query.edit_message_text("❌ Failed to whitelist group.")
     
     elif action == "reject":
-        # Get group info before removing from pending
-        pending = load_json_file(PENDING_WHITELIST_PATH)
-        group_info = pending.get(group_id, {})
+        # Drop the pending request, track the rejection and check if the group
+        # should be blocked, all in one write
+        group_info, is_blocked, rejection_count = await asyncio.to_thread(
+            reject_pending_whitelist, group_id
+        )
         group_name = group_info.get("group_name", f"Group {group_id}")
         admin_id = group_info.get("admin_id")
-        admin_name = group_info.get("admin_name")
-
-        # Track the rejection and check if group should be blocked
-        is_blocked = track_rejection(group_id, group_name, admin_id, admin_name)
-
-        # Remove from pending
-        remove_pending_whitelist(group_id)
-
-        # Get current rejection count for display
-        rejection_count = get_rejection_count(group_id)
-
-        # Notify the group admin about rejection
-        if admin_id:
-            try:
-                if is_blocked:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text="🚫 **GROUP PERMANENTLY BLOCKED** 🚫\n\n"
-                             f"Your group '{group_name}' has been rejected for the 3rd time and is now permanently blocked.\n\n"
-                             "**What this means:**\n"
-                             "• Your group can no longer submit whitelist requests\n"
-                             "• The bot will ignore all commands from your group\n"
-                             "• The bot will ignore all activity in your group\n\n"
-                             "If you believe this is an error, contact @rain5966",
-                        parse_mode="Markdown"
-                    )
-                else:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text="❌ **Whitelist Request Rejected** ❌\n\n"
-                             f"Your group '{group_name}' has been rejected.\n\n"
-                             f"**Strike Count:** {rejection_count}/3\n\n"
-                             "⚠️ **Warning:** After 3 rejections, your group will be permanently blocked.\n\n"
-                             "You can submit a new whitelist request, but please ensure you meet all requirements. "
-                             "Contact @rain5966 for clarification on requirements.",
-                        parse_mode="Markdown"
-                    )
-            except Exception as e:
-                logger.error(f"Error notifying admin about rejection: {e}")
 
         if is_blocked:
-            await query.edit_message_text(
+            _blocked_groups.add(group_id)
+            notice = _BLOCKED_MSG.format(group_name=group_name)
+            ack = query.edit_message_text(
                 f"❌ Group {group_id} has been rejected.\n"
                 f"🚫 **GROUP BLOCKED** - This group has reached 3 rejections and is now permanently blocked.\n"
                 f"Total rejections: {rejection_count}/3\n"
                 f"Admin has been notified."
             )
         else:
-            await query.edit_message_text(
+            notice = _REJECTED_WARN_MSG.format(group_name=group_name, rejection_count=rejection_count)
+            ack = query.edit_message_text(
                 f"❌ Group {group_id} has been rejected.\n"
                 f"Rejections: {rejection_count}/3\n"
                 f"Admin has been notified about the 3-strike policy."
             )
 
+        # Notify the group admin about rejection while acknowledging the owner
+        if admin_id:
+            await _notify_group(context.bot, group_id, notice, ack)
+        else:
+            await ack
+
+# Telegram rejects messages over 4096 characters; leave room for Markdown entities
+ADMIN_PAGE_LIMIT = 3500
+
+def _paginate(parts, limit=ADMIN_PAGE_LIMIT):
+    """Join message parts into pages of at most `limit` characters (a part is never split)."""
+    page, size = [], 0
+    for part in parts:
+        if page and size + len(part) > limit:
+            yield "".join(page)
+            page, size = [], 0
+        page.append(part)
+        size += len(part)
+    if page:
+        yield "".join(page)
+
 async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle admin commands for whitelist management."""
     # Check if user is the admin
@@ -502,172 +952,125 @@ async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TY
     
     if not context.args:
         # Show admin help
-        await update.message.reply_text(
-            "👑 *Admin Commands* 👑\n\n"
-            "**Whitelist Management:**\n"
-            "/admin pending - View pending whitelist requests\n"
-            "/admin approve <group_id> - Approve a group\n"
-            "/admin reject <group_id> - Reject a group\n"
-            "/admin list - List all whitelisted groups\n\n"
-            "**3-Strike System Management:**\n"
-            "/admin blocked - List all blocked groups\n"
-            "/admin rejections - Show all groups with rejections\n"
-            "/admin strikes <group_id> - Show rejection count for a group\n"
-            "/admin unblock <group_id> - Reset rejection count and unblock a group",
-            parse_mode="Markdown"
-        )
+        await update.message.reply_text(_ADMIN_HELP_MSG, parse_mode="Markdown")
         return
     
     command = context.args[0].lower()
     
     if command == "pending":
         # Show pending requests
-        pending = load_json_file(PENDING_WHITELIST_PATH)
+        pending = await asyncio.to_thread(get_pending_whitelist)
         if not pending:
             await update.message.reply_text("No pending whitelist requests.")
             return
         
-        message = "📋 *Pending Whitelist Requests:*\n\n"
+        parts = ["📋 *Pending Whitelist Requests:*\n\n"]
         for group_id, info in pending.items():
-            message += f"• Group: {info.get('group_name', 'Unknown')}\n"
-            message += f"  ID: `{group_id}`\n"
-            message += f"  Admin: {info.get('admin_name', 'Unknown')}\n"
-            message += f"  Admin ID: `{info.get('admin_id', 'Unknown')}`\n\n"
+            parts.append(
+                f"• Group: {info.get('group_name', 'Unknown')}\n"
+                f"  ID: `{group_id}`\n"
+                f"  Admin: {info.get('admin_name', 'Unknown')}\n"
+                f"  Admin ID: `{info.get('admin_id', 'Unknown')}`\n\n"
+            )
         
-        await update.message.reply_text(message, parse_mode="Markdown")
+        for page in _paginate(parts):
+            await update.message.reply_text(page, parse_mode="Markdown")
     
     elif command == "approve" and len(context.args) == 2:
         group_id = context.args[1]
 
-        # Get group info before removing from pending
-        pending = load_json_file(PENDING_WHITELIST_PATH)
-        group_info = pending.get(group_id, {})
-        group_name = group_info.get("group_name", f"Group {group_id}")
-        admin_id = group_info.get("admin_id")
+        # Whitelist and drop the pending request, keeping its info for the notice
+        saved, group_info = await asyncio.to_thread(approve_pending_whitelist, group_id)
+        if saved:
+            _whitelisted_groups.add(group_id)
+            group_name = group_info.get("group_name", f"Group {group_id}")
+            admin_id = group_info.get("admin_id")
 
-        if whitelist_group(group_id):
-            remove_pending_whitelist(group_id)
-
-            # Notify the group admin about approval
+            # Notify the group admin about approval while acknowledging the owner
+            reply = update.message.reply_text(f"✅ Group {group_id} has been whitelisted and admin notified.")
             if admin_id:
-                try:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text="✅ **GROUP APPROVED!** ✅\n\n"
-                             f"Congratulations! Your group '{group_name}' has been approved for the whitelist.\n\n"
-                             "**Next Steps:**\n"
-                             "1. Use `/setup` in your group to configure token requirements\n"
-                             "2. Set the bot as an admin with permission to add/remove members\n"
-                             "3. Share the verification link with your members\n\n"
-                             "Your group is now ready for token-gated access!",
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    logger.error(f"Error notifying admin: {e}")
-
-            await update.message.reply_text(f"✅ Group {group_id} has been whitelisted and admin notified.")
+                await _notify_group(
+                    context.bot, group_id, _APPROVED_MSG.format(group_name=group_name), reply
+                )
+            else:
+                await reply
         else:
             await update.message.reply_text("❌ Failed to whitelist group.")
     
     elif command == "reject" and len(context.args) == 2:
         group_id = context.args[1]
 
-        # Get group info before removing from pending
-        pending = load_json_file(PENDING_WHITELIST_PATH)
-        group_info = pending.get(group_id, {})
+        # Drop the pending request, track the rejection and check if the group
+        # should be blocked, all in one write
+        group_info, is_blocked, rejection_count = await asyncio.to_thread(
+            reject_pending_whitelist, group_id
+        )
         group_name = group_info.get("group_name", f"Group {group_id}")
         admin_id = group_info.get("admin_id")
-        admin_name = group_info.get("admin_name")
-
-        # Track the rejection and check if group should be blocked
-        is_blocked = track_rejection(group_id, group_name, admin_id, admin_name)
-
-        # Remove from pending
-        remove_pending_whitelist(group_id)
-
-        # Get current rejection count for display
-        rejection_count = get_rejection_count(group_id)
-
-        # Notify the group admin about rejection
-        if admin_id:
-            try:
-                if is_blocked:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text="🚫 **GROUP PERMANENTLY BLOCKED** 🚫\n\n"
-                             f"Your group '{group_name}' has been rejected for the 3rd time and is now permanently blocked.\n\n"
-                             "**What this means:**\n"
-                             "• Your group can no longer submit whitelist requests\n"
-                             "• The bot will ignore all commands from your group\n"
-                             "• The bot will ignore all activity in your group\n\n"
-                             "If you believe this is an error, contact @rain5966",
-                        parse_mode="Markdown"
-                    )
-                else:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text="❌ **Whitelist Request Rejected** ❌\n\n"
-                             f"Your group '{group_name}' has been rejected.\n\n"
-                             f"**Strike Count:** {rejection_count}/3\n\n"
-                             "⚠️ **Warning:** After 3 rejections, your group will be permanently blocked.\n\n"
-                             "You can submit a new whitelist request, but please ensure you meet all requirements. "
-                             "Contact @rain5966 for clarification on requirements.",
-                        parse_mode="Markdown"
-                    )
-            except Exception as e:
-                logger.error(f"Error notifying admin about rejection: {e}")
 
         if is_blocked:
-            await update.message.reply_text(
+            _blocked_groups.add(group_id)
+            notice = _BLOCKED_MSG.format(group_name=group_name)
+            ack = update.message.reply_text(
                 f"❌ Group {group_id} has been rejected.\n"
                 f"🚫 **GROUP BLOCKED** - This group has reached 3 rejections and is now permanently blocked.\n"
                 f"Total rejections: {rejection_count}/3\n"
                 f"Admin has been notified."
             )
         else:
-            await update.message.reply_text(
+            notice = _REJECTED_WARN_MSG.format(group_name=group_name, rejection_count=rejection_count)
+            ack = update.message.reply_text(
                 f"❌ Group {group_id} has been rejected.\n"
                 f"Rejections: {rejection_count}/3\n"
                 f"Admin has been notified about the 3-strike policy."
             )
+
+        # Notify the group admin about rejection while acknowledging the owner
+        if admin_id:
+            await _notify_group(context.bot, group_id, notice, ack)
+        else:
+            await ack
     
     elif command == "list":
-        whitelist = load_json_file(WHITELIST_PATH)
+        whitelist = await asyncio.to_thread(get_whitelist)
         if not whitelist:
             await update.message.reply_text("No groups are whitelisted yet.")
             return
 
-        message = "✅ *Whitelisted Groups:*\n\n"
-        for group_id in whitelist.keys():
-            message += f"• `{group_id}`\n"
+        parts = ["✅ *Whitelisted Groups:*\n\n"]
+        parts.extend(f"• `{group_id}`\n" for group_id in whitelist)
 
-        await update.message.reply_text(message, parse_mode="Markdown")
+        for page in _paginate(parts):
+            await update.message.reply_text(page, parse_mode="Markdown")
 
     elif command == "blocked":
-        blocked_groups = get_blocked_groups()
+        blocked_groups = await asyncio.to_thread(get_blocked_groups)
         if not blocked_groups:
             await update.message.reply_text("No groups are currently blocked.")
             return
 
-        message = "🚫 *Blocked Groups (3+ rejections):*\n\n"
+        parts = ["🚫 *Blocked Groups (3+ rejections):*\n\n"]
         for group_id, data in blocked_groups.items():
             group_name = data.get("group_name", f"Group {group_id}")
             rejection_count = data.get("rejection_count", 0)
             last_admin = data.get("last_admin_name", "Unknown")
-            message += f"• **{group_name}**\n"
-            message += f"  ID: `{group_id}`\n"
-            message += f"  Rejections: {rejection_count}\n"
-            message += f"  Last Admin: {last_admin}\n\n"
+            parts.append(
+                f"• **{group_name}**\n"
+                f"  ID: `{group_id}`\n"
+                f"  Rejections: {rejection_count}\n"
+                f"  Last Admin: {last_admin}\n\n"
+            )
 
-        await update.message.reply_text(message, parse_mode="Markdown")
+        for page in _paginate(parts):
+            await update.message.reply_text(page, parse_mode="Markdown")
 
     elif command == "rejections":
-        all_rejections = get_all_rejections()
+        all_rejections = await asyncio.to_thread(get_all_rejections)
         if not all_rejections:
             await update.message.reply_text("No groups have been rejected yet.")
             return
 
-        message = "📊 *All Groups with Rejections:*\n\n"
+        parts = ["📊 *All Groups with Rejections:*\n\n"]
         for group_id, data in all_rejections.items():
             group_name = data.get("group_name", f"Group {group_id}")
             rejection_count = data.get("rejection_count", 0)
@@ -675,22 +1078,25 @@ async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TY
             last_admin = data.get("last_admin_name", "Unknown")
             status = "🚫 BLOCKED" if blocked else f"⚠️ {rejection_count}/3"
 
-            message += f"• **{group_name}** {status}\n"
-            message += f"  ID: `{group_id}`\n"
-            message += f"  Rejections: {rejection_count}\n"
-            message += f"  Last Admin: {last_admin}\n\n"
+            parts.append(
+                f"• **{group_name}** {status}\n"
+                f"  ID: `{group_id}`\n"
+                f"  Rejections: {rejection_count}\n"
+                f"  Last Admin: {last_admin}\n\n"
+            )
 
-        await update.message.reply_text(message, parse_mode="Markdown")
+        for page in _paginate(parts):
+            await update.message.reply_text(page, parse_mode="Markdown")
 
     elif command == "strikes" and len(context.args) == 2:
         group_id = context.args[1]
-        rejection_count = get_rejection_count(group_id)
-        is_blocked = is_group_blocked(group_id)
+        rejection_count = await asyncio.to_thread(get_rejection_count, group_id)
+        is_blocked = group_id in _blocked_groups
 
         if rejection_count == 0 and not is_blocked:
             await update.message.reply_text(f"Group `{group_id}` has no rejections.")
         else:
-            all_rejections = get_all_rejections()
+            all_rejections = await asyncio.to_thread(get_all_rejections)
             group_data = all_rejections.get(group_id, {})
             group_name = group_data.get("group_name", f"Group {group_id}")
             last_admin = group_data.get("last_admin_name", "Unknown")
@@ -710,13 +1116,14 @@ async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TY
         group_id = context.args[1]
 
         # Check if group has rejections
-        rejection_count = get_rejection_count(group_id)
+        rejection_count = await asyncio.to_thread(get_rejection_count, group_id)
         if rejection_count == 0:
             await update.message.reply_text(f"Group `{group_id}` has no rejections to clear.")
             return
 
         # Reset rejection count
-        if reset_rejection_count(group_id):
+        if await asyncio.to_thread(reset_rejection_count, group_id):
+            _blocked_groups.discard(group_id)
             await update.message.reply_text(
                 f"✅ **Group Unblocked**\n\n"
                 f"Group `{group_id}` has been unblocked.\n"
@@ -744,7 +1151,7 @@ async def handle_dm_start_command(update: Update, context: ContextTypes.DEFAULT_
     if context.args:
         # This is a verification link
         token = context.args[0]
-        group_id = get_group_from_token(token)
+        group_id = await get_group_from_token(token)
         
         if not group_id:
             await update.message.reply_text("❌ Invalid verification link. Please contact the group admin for a valid link.")
@@ -753,12 +1160,12 @@ async def handle_dm_start_command(update: Update, context: ContextTypes.DEFAULT_
         # 🔑 Owner bypass with group invite
         if is_owner(user_id):
             try:
-                chat = await context.bot.get_chat(group_id)
+                chat = await get_chat_cached(context.bot, group_id)
                 invite_link = await chat.create_invite_link(
                     name=f"Owner access {user_id}",
                     member_limit=1,
                     creates_join_request=False,
-                    expire_date = datetime.now(timezone.utc) + timedelta(minutes=10)
+                    expire_date=int(time.time()) + INVITE_LINK_TTL
                 )
                 await update.message.reply_text(
                     f"👑 Owner detected!\n\n"
@@ -775,17 +1182,15 @@ async def handle_dm_start_command(update: Update, context: ContextTypes.DEFAULT_
             return
 
         # 🔍 New logic: Check if user already verified in this group
-        user_data = load_json_file(USER_DATA_PATH)
-        if (
-            group_id in user_data
-            and str(user_id) in user_data[group_id]
-            and user_data[group_id][str(user_id)].get("verified", False)
-        ):
+        record = (await load_user_data(group_id)).get(str(user_id))
+        if record is not None and record.get("verified", False):
             try:
-                member = await context.bot.get_chat_member(chat_id=group_id, user_id=user_id)
+                member, chat = await asyncio.gather(
+                    context.bot.get_chat_member(chat_id=group_id, user_id=user_id),
+                    get_chat_cached(context.bot, group_id),
+                )
                 if member.status in ["member", "administrator", "creator"]:
                     # User is still inside the group
-                    chat = await context.bot.get_chat(group_id)
                     await update.message.reply_text(
                         f"✅ You are already verified for *{chat.title}*.\n"
                         "You are also still in the group, so nothing to do here unless admin resets the bot.",
@@ -794,12 +1199,11 @@ async def handle_dm_start_command(update: Update, context: ContextTypes.DEFAULT_
                     return
                 else:
                     # User was verified before, but left the group – give new invite
-                    chat = await context.bot.get_chat(group_id)
                     invite_link = await chat.create_invite_link(
                         name=f"Rejoin {user_id}",
                         member_limit=1,
                         creates_join_request=False,
-                        expire_date = datetime.now(timezone.utc) + timedelta(minutes=10)
+                        expire_date=int(time.time()) + INVITE_LINK_TTL
                     )
                     await update.message.reply_text(
                         f"🔄 You were previously verified for *{chat.title}*, "
@@ -811,24 +1215,18 @@ async def handle_dm_start_command(update: Update, context: ContextTypes.DEFAULT_
             except Exception as e:
                 logger.error(f"Error checking membership for {user_id} in {group_id}: {e}")
    
-        # Store verification session
-        verification_sessions[(user_id, group_id)] = {
+        # Store verification session; the group's config is captured once here
+        # so later steps don't reload config.json
+        config = await asyncio.to_thread(cached_load_json, CONFIG_PATH)
+        verification_sessions[user_id] = {
             "group_id": group_id,
+            "group_config": config.get(group_id),
             "step": "awaiting_address"
         }
         
-        keyboard = [
-            [InlineKeyboardButton("📝 Enter Wallet Address", callback_data="enter_address")],
-            [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await update.message.reply_text(
-            "🔐 *WenPadGateBot Verification* 🔐\n\n"
-            "Welcome to the token verification process!\n\n"
-            "To join the private group, you must verify your token holdings.\n\n"
-            "Click the button below to enter your wallet address and begin verification.",
-            reply_markup=reply_markup,
+            _VERIFY_WELCOME_MSG,
+            reply_markup=_ENTER_ADDRESS_MARKUP,
             parse_mode="Markdown"
         )
     else:
@@ -859,7 +1257,7 @@ async def handle_group_start_command(update: Update, context: ContextTypes.DEFAU
 
     # Check if group is blocked (3-strike policy)
     group_id = str(update.message.chat_id)
-    if is_group_blocked(group_id):
+    if group_id in _blocked_groups:
         # Ignore all input from blocked groups - don't respond
         return
     
@@ -869,12 +1267,66 @@ async def handle_group_start_command(update: Update, context: ContextTypes.DEFAU
             "👑 Owner intervention detected! "
             "Stop helping so much and let the project admin/owner do this."
         )
-    else:
-        await update.message.reply_text(
-            "👋 Hello! I'm a trustless token gate - WenPadGateBot, powered by WenPad Labs. I verify token balances and manage access to your group.\n"
-            "Use /help to see available commands, or if you are ready to gate this group, use /setup."
+    else:
+        await update.message.reply_text(
+            "👋 Hello! I'm a trustless token gate - WenPadGateBot, powered by WenPad Labs. I verify token balances and manage access to your group.\n"
+            "Use /help to see available commands, or if you are ready to gate this group, use /setup."
+        )
+
+async def finish_transfer_verification(bot, user_id, session, verifying_msg):
+    """Record a user whose ownership transfer was found and send them an invite link."""
+    async with _user_data_lock:
+        group_users = await load_user_data_for_update(session["group_id"])
+
+        # Race-safe duplicate check just before write
+        duplicate = is_wallet_taken(group_users, session["group_id"], session["address"], user_id)
+        if not duplicate:
+            group_users[str(user_id)] = {
+                "address": session["address"],
+                "verified": True,
+                "last_verified": int(time.time()),
+                "verification_tx": True,
+                # Lets the cron skip re-checking a balance confirmed moments ago
+                "verified_at": session.get("balance_checked_at", int(time.time())),
+                "had_balance": True,
+            }
+            schedule_user_data_save(session["group_id"], group_users)
+
+    if duplicate:
+        await verifying_msg.edit_text(
+            "❌ This wallet is already linked to another verified member of this group. "
+            "Use a different wallet or ask the admin to reset them."
+        )
+        verification_sessions.pop(user_id, None)
+        return
+
+    # Create invite link for the group
+    try:
+        chat = await get_chat_cached(bot, session["group_id"])
+        invite_link = await chat.create_invite_link(
+            name=f"Verified member {user_id}",
+            member_limit=1,
+            creates_join_request=False,
+            expire_date=int(time.time()) + INVITE_LINK_TTL
+        )
+        keyboard = [[InlineKeyboardButton("✅ Join Group", url=invite_link.invite_link)]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await verifying_msg.edit_text(
+            _VERIFIED_JOIN_MSG,
+            parse_mode="HTML",
+            reply_markup=reply_markup
+        )
+    except Exception as e:
+        logger.error(f"Error creating invite link: {e}")
+        await verifying_msg.edit_text(
+            _VERIFIED_NO_LINK_MSG,
+            parse_mode="Markdown"
         )
 
+    # ✅ Success: remove session completely
+    verification_sessions.pop(user_id, None)
+
 async def handle_verification_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle verification button clicks."""
     query = update.callback_query
@@ -890,13 +1342,7 @@ async def handle_verification_button(update: Update, context: ContextTypes.DEFAU
         return
 
     # Find the user's session
-    user_session = None
-    session_key = None
-    for key, session in verification_sessions.items():
-        if key[0] == user_id:  # key[0] is user_id in the tuple (user_id, group_id)
-            user_session = session
-            session_key = key
-            break
+    user_session = verification_sessions.get(user_id)
 
     if not user_session:
         await query.edit_message_text(
@@ -911,10 +1357,14 @@ async def handle_verification_button(update: Update, context: ContextTypes.DEFAU
         )
 
     elif query.data == "cancel_verification":
-        del verification_sessions[session_key]
+        verification_sessions.pop(user_id, None)
         await query.edit_message_text("Verification cancelled. You can start again anytime with a new verification link.")
 
     elif query.data == "retry_transfer_check":
+        if user_session.get("step") == "checking_transfer":
+            await query.edit_message_text(_TRANSFER_CHECKING_MSG)
+            return
+
         # Enforce cooldown between retries
         now = int(time.time())
         last_retry = user_session.get("last_retry", 0)
@@ -934,11 +1384,9 @@ async def handle_verification_button(update: Update, context: ContextTypes.DEFAU
 
         if elapsed > timeout_seconds:
             # Session expired - hard fail
-            del verification_sessions[session_key]
+            verification_sessions.pop(user_id, None)
             await query.edit_message_text(
-                "❌ *Verification Timed Out* ❌\n\n"
-                "No valid transfer detected within 5 minutes.\n"
-                "Please restart verification using a new link from your group admin.",
+                _TIMED_OUT_MSG,
                 parse_mode="Markdown"
             )
             return
@@ -946,72 +1394,28 @@ async def handle_verification_button(update: Update, context: ContextTypes.DEFAU
         if user_session.get("step") == "awaiting_transfer" and "address" in user_session:
             verifying_msg = await query.edit_message_text("🔍 Retrying verification...")
 
-            config = load_json_file(CONFIG_PATH)
-            group_config = config.get(user_session["group_id"])
+            group_config = user_session["group_config"]
 
-            transfer_verified = await check_token_transfer_moralis(
-                group_config['verifier'],
-                user_session['address'],
-                group_config['token'],
-            )
+            # The on-chain check runs on a transfer worker; this handler returns right away
+            async def check_transfer():
+                transfer_verified = await check_token_transfer_once(
+                    group_config['verifier'],
+                    user_session['address'],
+                    group_config['token'],
+                )
 
-            if transfer_verified:
-                # ✅ Success path
-                user_data = load_json_file(USER_DATA_PATH)
-                if user_session["group_id"] not in user_data:
-                    user_data[user_session["group_id"]] = {}
-
-                user_data[user_session["group_id"]][str(user_id)] = {
-                    "address": user_session["address"],
-                    "verified": True,
-                    "last_verified": now,
-                    "verification_tx": True
-                }
-
-                save_json_file(USER_DATA_PATH, user_data)
-
-                try:
-                    chat = await context.bot.get_chat(user_session["group_id"])
-                    invite_link = await chat.create_invite_link(
-                        name=f"Verified member {user_id}",
-                        member_limit=1,
-                        creates_join_request=False,
-                        expire_date = datetime.now(timezone.utc) + timedelta(minutes=10)
-                    )
+                if transfer_verified:
+                    await finish_transfer_verification(context.bot, user_id, user_session, verifying_msg)
 
+                else:
+                    remaining = timeout_seconds - elapsed
                     await verifying_msg.edit_text(
-                        "✅ *Verification Complete!* ✅\n\n"
-                        "You have successfully verified and proven wallet ownership! 🎉\n\n"
-                        f"Here's your invite link:\n[Join Here]({invite_link.invite_link})",
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    logger.error(f"Error creating invite link: {e}")
-                    await verifying_msg.edit_text(
-                        "✅ *Verification Complete!* ✅\n\n"
-                        "You're verified, but I couldn't generate the invite link. Ask the group admin.",
-                        parse_mode="Markdown"
+                        _STILL_NOT_VERIFIED_MSG.format(remaining=remaining),
+                        parse_mode="Markdown",
+                        reply_markup=_RETRY_AGAIN_MARKUP
                     )
 
-                del verification_sessions[session_key]
-
-            else:
-                remaining = timeout_seconds - elapsed
-                keyboard = [
-                    [InlineKeyboardButton("🔁 Retry Again", callback_data="retry_transfer_check")],
-                    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                await verifying_msg.edit_text(
-                    f"❌ *Still Not Verified* ❌\n\n"
-                    f"The transfer is still not visible.\n"
-                    f"You still have {remaining} seconds before this session expires.\n\n"
-                    "Make sure the transaction is confirmed and you sent exactly 1 token.\n"
-                    "Retry after 1 minute if needed.",
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
+            await enqueue_session_transfer_check(user_id, user_session, check_transfer)
         else:
             await query.edit_message_text("⚠️ Session expired or invalid. Please restart verification.")
 
@@ -1032,53 +1436,38 @@ async def handle_dm_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Find the user's session
-    user_session = None
-    session_key = None
-    for key, session in verification_sessions.items():
-        if key[0] == user_id:  # key[0] is user_id in the tuple (user_id, group_id)
-            user_session = session
-            session_key = key
-            break
+    session = verification_sessions.get(user_id)
     
-    if not user_session:
+    if not session:
         await update.message.reply_text(
             "Please use a verification link from your group admin to start the verification process."
         )
         return
     
-    session = verification_sessions[(user_id, session["group_id"])]
-    
     if session["step"] == "awaiting_address":
         if is_valid_solana_address(message_text):
             session["address"] = message_text
             session["step"] = "checking_balance"
             
             # NEW: one-wallet-per-user per group (prevent reuse by someone else)
-            user_data = load_json_file(USER_DATA_PATH)
-            group_users = user_data.get(session["group_id"], {})
-            for uid, rec in group_users.items():
-                if (
-                    rec.get("address", "").lower() == message_text.lower()
-                    and uid != str(user_id)
-                    and rec.get("verified", False) is True
-                ):
-                    await update.message.reply_text(
-                        "❌ This wallet is already linked to another verified member of this group. "
-                        "Use a different wallet or ask the admin to reset them."
-                    )
-                    # End session safely without touching the database
-                    del verification_sessions[(user_id, session["group_id"])]
-                    return            
+            group_users = await load_user_data(session["group_id"])
+            if is_wallet_taken(group_users, session["group_id"], message_text, user_id):
+                await update.message.reply_text(
+                    "❌ This wallet is already linked to another verified member of this group. "
+                    "Use a different wallet or ask the admin to reset them."
+                )
+                # End session safely without touching the database
+                verification_sessions.pop(user_id, None)
+                return
             
             # Verify balance first
             verifying_msg = await update.message.reply_text("🔍 Checking your token balance...")
             
-            config = load_json_file(CONFIG_PATH)
-            group_config = config.get(session["group_id"])
+            group_config = session["group_config"]
             
             if not group_config:
                 await verifying_msg.edit_text("Group configuration not found. Please contact the group admin.")
-                del verification_sessions[(user_id, session["group_id"])]
+                verification_sessions.pop(user_id, None)
                 return
             
             has_balance = await verify_user_balance(group_config, message_text)
@@ -1087,6 +1476,7 @@ async def handle_dm_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Balance is sufficient, now ask for token transfer
                 session["step"] = "awaiting_transfer"
                 session["verified_balance"] = True
+                session["balance_checked_at"] = int(time.time())
                 
                 await verifying_msg.edit_text(
                     f"✅ Balance verified! You hold sufficient tokens.\n\n"
@@ -1104,7 +1494,7 @@ async def handle_dm_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     f"Required: {group_config['min_balance']} tokens\n"
                     "Please try again with a different wallet or contact the group admin if you believe this is an error."
                 )
-                del verification_sessions[(user_id, session["group_id"])]
+                verification_sessions.pop(user_id, None)
         else:
             await update.message.reply_text("Please send a valid Solana wallet address (Example - 8e5jkNeRnkz2HBzqu3fmiWEwv2kSeAMLutQcaqP3UtQ5):")
     
@@ -1117,118 +1507,49 @@ async def handle_dm_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if "first_fail_time" not in session:
             session["first_fail_time"] = now
         
-        config = load_json_file(CONFIG_PATH)
-        group_config = config.get(session["group_id"])
+        group_config = session["group_config"]
 
-        # Check if transfer occurred
-        transfer_verified = False
-        if MORALIS_API_KEY:
-            transfer_verified = await check_token_transfer_moralis(
+        # The on-chain check runs on a transfer worker; this handler returns right away
+        async def check_transfer():
+            # Check if transfer occurred (on-chain via Solana RPC, with or without Moralis)
+            transfer_verified = await check_token_transfer_once(
                 group_config['verifier'],
                 session['address'],
                 group_config['token'],
             )
-        else:
-            transfer_verified = await check_token_transfer(
-                group_config['verifier'],
-                session['address'],
-                group_config['token'],
-            )
-
-        if transfer_verified:
-            # ✅ User verified successfully
-            user_data = load_json_file(USER_DATA_PATH)
-            if session["group_id"] not in user_data:
-                user_data[session["group_id"]] = {}
-
-            # NEW: race-safe duplicate check just before write
-            for uid, rec in user_data.get(session["group_id"], {}).items():
-                if (
-                    rec.get("address", "").lower() == session["address"].lower()
-                    and uid != str(user_id)
-                    and rec.get("verified", False) is True
-                ):
-                    await verifying_msg.edit_text(
-                        "❌ This wallet is already linked to another verified member of this group. "
-                        "Use a different wallet or ask the admin to reset them."
-                    )
-                    del verification_sessions[(user_id, session["group_id"])]
-                    return
-
-            user_data[session["group_id"]][str(user_id)] = {
-                "address": session["address"],
-                "verified": True,
-                "last_verified": int(time.time()),
-                "verification_tx": True
-            }
-            save_json_file(USER_DATA_PATH, user_data)
-
-            # Create invite link for the group
-            try:
-                chat = await context.bot.get_chat(session["group_id"])
-                invite_link = await chat.create_invite_link(
-                    name=f"Verified member {user_id}",
-                    member_limit=1,
-                    creates_join_request=False,
-                    expire_date = datetime.now(timezone.utc) + timedelta(minutes=10)
-                )
-                keyboard = [[InlineKeyboardButton("✅ Join Group", url=invite_link.invite_link)]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
 
-                await verifying_msg.edit_text(
-                    "✅ <b>Verification Complete!</b>\n\n"
-                    "You have successfully verified your token holdings and proven wallet ownership! 🎉\n\n"
-                    "Click below to join the group:",
-                    parse_mode="HTML",
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                logger.error(f"Error creating invite link: {e}")
-                await verifying_msg.edit_text(
-                    "✅ *Verification Complete!* ✅\n\n"
-                    "You have successfully verified! 🎉\n\n"
-                    "Please contact the group admin for an invite link.",
-                    parse_mode="Markdown"
-                )
+            if transfer_verified:
+                await finish_transfer_verification(context.bot, user_id, session, verifying_msg)
 
-            # ✅ Success: remove session completely
-            del verification_sessions[(user_id, session["group_id"])]
+            else:
+                # ❌ Transfer not yet found – track first failure and give user time
+                now = int(time.time())
+                if "first_fail_time" not in session:
+                    session["first_fail_time"] = now
 
-        else:
-            # ❌ Transfer not yet found – track first failure and give user time
-            now = int(time.time())
-            if "first_fail_time" not in session:
-                session["first_fail_time"] = now
+                timeout_seconds = 300  # 5 minutes total session time
+                elapsed = now - session["first_fail_time"]
 
-            timeout_seconds = 300  # 5 minutes total session time
-            elapsed = now - session["first_fail_time"]
+                if elapsed > timeout_seconds:
+                    # Hard fail – end session
+                    verification_sessions.pop(user_id, None)
+                    await verifying_msg.edit_text(
+                        _TIMED_OUT_MSG,
+                        parse_mode="Markdown"
+                    )
+                else:
+                    remaining = timeout_seconds - elapsed
+                    await verifying_msg.edit_text(
+                        _TRANSFER_PENDING_MSG.format(remaining=remaining),
+                        parse_mode="Markdown",
+                        reply_markup=_RETRY_VERIFICATION_MARKUP
+                    )
+                    # 👀 IMPORTANT: session is NOT deleted here — user can retry
 
-            if elapsed > timeout_seconds:
-                # Hard fail – end session
-                del verification_sessions[(user_id, session["group_id"])]
-                await verifying_msg.edit_text(
-                    "❌ *Verification Timed Out* ❌\n\n"
-                    "No valid transfer detected within 5 minutes.\n"
-                    "Please restart verification using a new link from your group admin.",
-                    parse_mode="Markdown"
-                )
-            else:
-                remaining = timeout_seconds - elapsed
-                keyboard = [
-                    [InlineKeyboardButton("🔁 Retry Verification", callback_data="retry_transfer_check")],
-                    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_verification")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+        await enqueue_session_transfer_check(user_id, session, check_transfer)
 
-                await verifying_msg.edit_text(
-                    f"❌ *Transfer Not Verified Yet* ❌\n\n"
-                    f"It can take a few minutes for the blockchain to confirm your transfer.\n"
-                    f"You still have {remaining} seconds before this session expires.\n\n"
-                    "Wait at least a minute, then tap below to try again.",
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
-                # 👀 IMPORTANT: session is NOT deleted here — user can retry
+    elif session["step"] == "checking_transfer":
+        await update.message.reply_text(_TRANSFER_CHECKING_MSG)
     
     elif session["step"] == "awaiting_transfer":
         await update.message.reply_text(
@@ -1245,7 +1566,7 @@ async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
 
     # ✅ Check if group is blocked (3-strike policy) - ignore all input
-    if is_group_blocked(group_id):
+    if group_id in _blocked_groups:
         # Ignore all input from blocked groups - no actions taken
         return
     
@@ -1257,46 +1578,59 @@ async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    config = load_json_file(CONFIG_PATH)
+    config = await asyncio.to_thread(cached_load_json, CONFIG_PATH)
     group_config = config.get(group_id)
     
     if not group_config:
         return  # Group not configured
     
+    # One user_data lookup covers every member in this update
+    group_users = await load_user_data(group_id)
+
+    unverified = []
     for new_member in update.message.new_chat_members:
         if new_member.id == context.bot.id:
             await update.message.reply_text("Thanks for adding me! Use /setup to configure token requirements.")
-            return
+            break
         
         # IMMEDIATELY remove any non-verified user who joins
-        user_data = load_json_file(USER_DATA_PATH)
-        user_verified = user_data.get(group_id, {}).get(str(new_member.id), {}).get("verified", False)
+        record = group_users.get(str(new_member.id))
+        if not (record is not None and record.get("verified", False)):
+            unverified.append(new_member)
+
+    if not unverified:
+        return
+
+    # Members are independent: kick them all concurrently (each one's
+    # ban -> unban -> DM sequence still runs in order)
+    verification_link = await generate_verification_link(group_id)
+    if verification_link is None:
+        # Still remove them; the DM points to the admin instead of a dead link
+        verification_link = "ask the group admin for the verification link"
+    await asyncio.gather(*(
+        _kick_and_notify(context.bot, group_id, member.id, verification_link)
+        for member in unverified
+    ))
+
+async def _kick_and_notify(bot, group_id, member_id, verification_link):
+    """Remove an unverified member and DM them the group's verification link."""
+    try:
+        await bot.ban_chat_member(chat_id=group_id, user_id=member_id)
+        await bot.unban_chat_member(chat_id=group_id, user_id=member_id)
         
-        if not user_verified:
-            try:
-                await context.bot.ban_chat_member(chat_id=group_id, user_id=new_member.id)
-                await context.bot.unban_chat_member(chat_id=group_id, user_id=new_member.id)
-                
-                # Send them a message with verification instructions
-                verification_link = generate_verification_link(group_id)
-                
-                try:
-                    await context.bot.send_message(
-                        chat_id=new_member.id,
-                        text="❌ *Access Denied* ❌\n\n"
-                             "You tried to join a private token-gated group without verification.\n\n"
-                             "To join this group, you must:\n"
-                             "1. Verify your token holdings first\n"
-                             "2. Receive an invite link\n"
-                             "3. Then join the group\n\n"
-                             f"Start verification here: {verification_link}",
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    logger.error(f"Could not DM user: {e}")
-                
-            except Exception as e:
-                logger.error(f"Error removing unverified user: {e}")
+        # Send them a message with verification instructions
+        try:
+            await _send(
+                bot,
+                chat_id=member_id,
+                text=_ACCESS_DENIED_MSG.format(verification_link=verification_link),
+                parse_mode="Markdown"
+            )
+        except Exception as e:
+            logger.error(f"Could not DM user: {e}")
+        
+    except Exception as e:
+        logger.error(f"Error removing unverified user: {e}")
 
 # ---------------------------------------------
 # Debug Commands for Testing
@@ -1307,16 +1641,16 @@ async def test_verify(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Owner only command.")
         return
     
-    config = load_json_file(CONFIG_PATH)
+    config = await asyncio.to_thread(cached_load_json, CONFIG_PATH)
     if not config:
         await update.message.reply_text("❌ No groups configured!")
         return
     
-    await update.message.reply_text("🔄 Running test verification...")
+    await update.message.reply_text(f"🔄 Running test verification for {len(config)} groups...")
     
-    for group_id, group_config in config.items():
-        await update.message.reply_text(f"🔍 Testing group {group_id}...")
-        await verify_all_members(context.bot, group_id, group_config)
+    # The run reads user_data from storage, so write out any pending changes first
+    await flush_user_data()
+    await verify_groups(context.bot, config)
     
     await update.message.reply_text("✅ Test verification completed!")
 
@@ -1344,7 +1678,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if this is a group and if group is blocked (3-strike policy)
     if update.message.chat.type in ["group", "supergroup"]:
         group_id = str(update.message.chat_id)
-        if is_group_blocked(group_id):
+        if group_id in _blocked_groups:
             # Ignore all input from blocked groups - don't respond
             return
     
@@ -1366,42 +1700,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if this is a group and if group is blocked (3-strike policy)
     if update.message.chat.type in ["group", "supergroup"]:
         group_id = str(update.message.chat_id)
-        if is_group_blocked(group_id):
+        if group_id in _blocked_groups:
             # Ignore all input from blocked groups - don't respond
             return
     
     if is_owner(user_id):
-        await update.message.reply_text("""
-👑 *Owner Commands* 👑
-/setup - Setup group token rules (bypasses whitelist)
-/admin - Manage whitelist requests
-/status - Check group settings
-/guide - Complete step-by-step guide
-/test_verify - Run verification immediately (testing)
-/testbalance <wallet_address> <token_address>  - Test token balance across APIs
-/dump - dump the config/user data straight into your Telegram DM
-/admin blocked - List all blocked groups
-/admin rejections - Show all groups with rejections
-/admin strikes <group_id> - Show rejection count for a specific group
-/admin unblock <group_id> - Reset rejection count and unblock a group
-/help - Show this help menu
-""")
+        await update.message.reply_text(_HELP_OWNER_MSG)
     else:
-        await update.message.reply_text("""
-*Available Commands:*
-
-👨‍💼 *For Group Admins:*
-/setup - Setup your group with token rules
-/status - View current group settings & get verification link
-/testbalance <wallet_address> <token_address> - Test token balance across APIs
-/guide - Complete step-by-step setup guide
-
-👤 *For Members:*
-/guide - How to verify and join private groups
-/help - Show this help menu
-
-*Need help?* Use /guide for complete instructions or contact your group admin.
-""", parse_mode="Markdown")
+        await update.message.reply_text(_HELP_USER_MSG, parse_mode="Markdown")
 
 async def guide_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show complete step-by-step guide for admins and users."""
@@ -1411,107 +1717,16 @@ async def guide_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if this is a group and if group is blocked (3-strike policy)
     if chat_type in ["group", "supergroup"]:
         group_id = str(update.message.chat_id)
-        if is_group_blocked(group_id):
+        if group_id in _blocked_groups:
             # Ignore all input from blocked groups - don't respond
             return
     
     if chat_type in ["group", "supergroup"]:
         # Group guide - for admins
-        guide_text = """
-📖 *Complete Admin Guide - WenPadGateBot * 📖
-
-*1. SETUP YOUR GROUP*
-• Create a private group with no other members present
-• Go to user permissions in group settings and only leave Send Text and Media messages, disable the rest
-• Invite @WenPadGateBot and set bot as admin with add and remove members permissions
-
-*2. GET WHITELISTED (First Time Only)*
-• Use `/setup` in your group
-• DM @rain5966 with your request
-• Send a one time fee of 2 SOL to: `8e5jkNeRnkz2HBzqu3fmiWEwv2kSeAMLutQcaqP3UtQ5`
-• Wait for approval notification
-• Use `/setup` after whitelist approved message
-• Follow the interactive setup:
-  - Enter chain (currently only SOL)
-  - Enter token contract address
-  - Enter minimum required balance
-  - Enter verifier wallet address (where users send 1 token to verify wallet ownership)
-
-*3. SHARE VERIFICATION LINK*
-• Use `/status` to get your unique verification link
-• Share this link with your members
-• Members MUST verify BEFORE joining
-
-*4. MEMBER VERIFICATION PROCESS*
-1. Member clicks your verification link
-2. They DM the bot with their wallet address
-3. Bot checks if they hold enough tokens
-4. If yes, they send 1 token to verifier address
-5. Bot verifies the transfer
-6. Member receives instant invite link
-
-*5. AUTOMATIC PROTECTION*
-• Bot automatically removes unverified users
-• Periodic checks ensure members still hold tokens
-• No grace period - verification required first
-
-🔧 *Admin Commands:*
-`/setup` - Configure group requirements
-`/status` - View settings & get verification link
-`/testbalance` - Usage: /testbalance <wallet_address> <token_address>
-`/help` - Show all commands
-
-Need help? Contact @rain5966
-"""
+        guide_text = _GUIDE_GROUP_MSG
     else:
         # DM guide - for users
-        guide_text = """
-📖 *Complete User Guide - WenPadLabsBot, powered by WenPad Labs* 📖
-
-*HOW TO JOIN A PRIVATE GROUP:*
-
-*1. GET VERIFICATION LINK*
-• Ask the group admin for a verification link
-• The link looks like: `t.me/wenpadgatebot?start=AbCdEfGh123456`
-
-*2. START VERIFICATION*
-• Click the verification link
-• You'll be redirected to this bot
-• Tap "Enter Wallet Address" button
-
-*3. PROVIDE WALLET ADDRESS*
-• Send your Solana wallet address
-• Example: 8e5jkNeRnkz2HBzqu3fmiWEwv2kSeAMLutQcaqP3UtQ5
-• Bot will check your token balance
-
-*4. COMPLETE OWNERSHIP PROOF*
-• If you have enough tokens, you'll be asked to:
-• Send exactly **1 token** to the verifier address
-• This proves you own the wallet
-• After sending, type 'done' in this chat
-
-*5. RECEIVE INVITE LINK*
-• Bot will verify your transfer
-• You'll receive a one-time invite link
-• Click the link to join the private group
-
-*IMPORTANT NOTES:*
-🔒 Your wallet address is only used for verification
-⏰ Invite links expire quickly (use immediately)
-🔄 If transfer isn't detected, use "Retry" button
-❌ Don't join the group without verification - you'll be removed
-
-Need help? Contact your group admin.
-
-*BRIEF GROUP ADMIN INSTRUCTIONS*
-*SETUP YOUR GROUP*
-• Create a private group with no other members present
-• Go to user permissions in group settings and only leave Send Text and Media messages, disable the rest
-• Invite @WenPadGateBot and set bot as admin with add and remove members permissions
-• Use `/setup` in your group to get whitelisted
-• Use `/guide` in your group for more detailed admin guide
-
-"""
+        guide_text = _GUIDE_DM_MSG
     
     await update.message.reply_text(guide_text, parse_mode="Markdown")
 
@@ -1521,14 +1736,14 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
 
     # ✅ Step 0: Check if group is blocked (3-strike policy)
-    if is_group_blocked(group_id):
+    if group_id in _blocked_groups:
         # Ignore all input from blocked groups - don't respond
         return
 
     # ✅ Step 1: Block non-admins and non-owner immediately
+    # (the owner needs no get_chat_member round-trip)
     try:
-        member = await context.bot.get_chat_member(chat_id=group_id, user_id=user_id)
-        if not is_admin(member) and not is_owner(user_id):
+        if not is_owner(user_id) and not await is_chat_admin(context.bot, group_id, user_id):
             await update.message.reply_text("❌ Only group admins can view group settings.")
             return
     except Exception as e:
@@ -1538,9 +1753,9 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # ✅ Step 2: Owner bypass whitelist, else check group whitelist
     if not is_owner(user_id):
-        if not is_group_whitelisted(group_id):
+        if group_id not in _whitelisted_groups:
             # Distinguish between never requested vs pending
-            whitelist_data = load_json_file(WHITELIST_PATH)
+            whitelist_data = await asyncio.to_thread(get_whitelist)
             if group_id not in whitelist_data:
                 await update.message.reply_text(
                     "❌ This group has never been whitelisted.\n\n"
@@ -1557,48 +1772,56 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
     # ✅ Step 3: Show current settings (if configured)
-    config = load_json_file(CONFIG_PATH)
+    config = await asyncio.to_thread(cached_load_json, CONFIG_PATH)
     group_config = config.get(group_id)
 
     if not group_config:
         await update.message.reply_text("No setup found. Use /setup to configure.")
         return
 
-    verification_link = generate_verification_link(group_id)
+    verification_link = await generate_verification_link(group_id)
+    if verification_link is None:
+        link_text = _LINK_UNAVAILABLE_MSG
+    else:
+        link_text = (
+            f"🔗 *Verification Link:*\n"
+            f"`{verification_link}`\n\n"
+            f"Share this link with your members. They must verify BEFORE joining."
+        )
     reply = (
         f"📊 *Group Settings:*\n"
         f"• Chain: {group_config['chain_id']}\n"
         f"• Token: `{group_config['token']}`\n"
         f"• Min Balance: {group_config['min_balance']}\n"
         f"• Verifier: `{group_config['verifier']}`\n\n"
-        f"🔗 *Verification Link:*\n"
-        f"`{verification_link}`\n\n"
-        f"Share this link with your members. They must verify BEFORE joining."
+        f"{link_text}"
     )
 
     await update.message.reply_text(reply, parse_mode="Markdown")
 
-BALANCE_APIS = [
-    {
-        "name": "Moralis",
-        "func": get_token_balance_moralis,  # async
-        "enabled": lambda: MORALIS_API_KEY and len(MORALIS_API_KEY) > 20,
-        "args": lambda wallet, token, chain: (wallet, token),
-    },
-    {
-        "name": "Solana RPC",
-        "func": get_token_balance_rpc,  # async
-        "enabled": lambda: True,
-        "args": lambda wallet, token, chain: (wallet, token),
-    },
-]
+@dataclass(slots=True, frozen=True)
+class BalanceAPI:
+    """A balance provider exercised by /testbalance."""
+    name: str
+    func: Callable  # async, called with build_args(wallet, token, chain)
+    enabled: Callable[[], bool]
+    build_args: Callable
+
+def _moralis_enabled():
+    return bool(MORALIS_API_KEY) and len(MORALIS_API_KEY) > 20
+
+def _always_enabled():
+    return True
+
+def _wallet_token_args(wallet, token, chain):
+    return (wallet, token)
+
+BALANCE_APIS = (
+    BalanceAPI("Moralis", get_token_balance_moralis, _moralis_enabled, _wallet_token_args),
+    BalanceAPI("Solana RPC", get_token_balance_rpc, _always_enabled, _wallet_token_args),
     # Add future balance API definitions here:
-    # {
-    #    "name": "Alchemy",
-    #    "func": get_token_balance_alchemy,
-    #    "enabled": lambda: ALCHEMY_API_KEY,
-    #    "args": lambda wallet, token, chain: (wallet, token, chain),
-    # }
+    # BalanceAPI("Alchemy", get_token_balance_alchemy, _alchemy_enabled, _wallet_token_chain_args),
+)
 
 # ---------------------------------------------
 # test get balance
@@ -1616,12 +1839,9 @@ async def test_balance_all(update, context):
     # Check if this is a group and if group is blocked (3-strike policy)
     if update.effective_chat.type in ["group", "supergroup"]:
         group_id = str(chat_id)
-        if is_group_blocked(group_id):
+        if group_id in _blocked_groups:
             return  # ignore blocked groups
 
-    def is_owner(user_id):
-        return str(user_id) == str(ADMIN_USER_ID)
-
     async def is_group_admin(chat_id, user_id):
         try:
             member = await context.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
@@ -1652,61 +1872,169 @@ async def test_balance_all(update, context):
         parse_mode="Markdown"
     )
 
+    # Query every enabled API at once; total latency is the slowest one
+    enabled = [api for api in BALANCE_APIS if api.enabled()]
+    balances = await asyncio.gather(
+        *(api.func(*api.build_args(wallet_address, token_mint, "sol")) for api in enabled),
+        return_exceptions=True,
+    )
+    outcome = {api.name: balance for api, balance in zip(enabled, balances)}
+
     results = []
     for api in BALANCE_APIS:
-        if not api["enabled"]():
-            results.append(f"*{api['name']}*: _Not configured or unavailable_")
+        if api.name not in outcome:
+            results.append(f"*{api.name}*: _Not configured or unavailable_")
             continue
-        try:
-            func_args = api["args"](wallet_address, token_mint, "sol")
-            balance = await api["func"](*func_args)
-            results.append(f"*{api['name']}*: `{balance}`")
-        except Exception as e:
-            results.append(f"*{api['name']}*: Error - `{str(e)}`")
+        balance = outcome[api.name]
+        if isinstance(balance, Exception):
+            results.append(f"*{api.name}*: Error - `{str(balance)}`")
+        else:
+            results.append(f"*{api.name}*: `{balance}`")
 
     await update.message.reply_text("\n".join(results), parse_mode="Markdown")
 
 # ---------------------------------------------
 # Error Handling
 # ---------------------------------------------
+# At most one owner error notification per this many seconds (an error storm
+# must not turn into a flood of DMs)
+ERROR_NOTIFY_INTERVAL = 5
+_last_error_notify = 0.0
+
+def _describe_update(update):
+    """Short summary of an update (id, chat, user) instead of its full repr."""
+    if not isinstance(update, Update):
+        return str(update)[:512]
+    chat = update.effective_chat
+    user = update.effective_user
+    return (
+        f"update_id={update.update_id} "
+        f"chat={chat.id if chat else None} "
+        f"user={user.id if user else None}"
+    )
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors."""
-    logger.error(f"Update {update} caused error {context.error}")
+    global _last_error_notify
+    summary = _describe_update(update)
+    logger.error(f"Update {summary} caused error {context.error}")
     
     # Optional: Notify admin of critical errors
     if isinstance(context.error, Exception):
+        now = time.monotonic()
+        if now - _last_error_notify < ERROR_NOTIFY_INTERVAL:
+            return
+        _last_error_notify = now
         try:
             await context.bot.send_message(
                 chat_id=ADMIN_USER_ID,
-                text=f"⚠️ Bot Error: {context.error}\n\nUpdate: {update}"
+                text=f"⚠️ Bot Error: {str(context.error)[:512]}\n\nUpdate: {summary}"
             )
         except:
             pass  # Avoid infinite error loop
 
+# /dump shows at most this many entries per level (the text is cut to 2000 chars anyway)
+DUMP_MAX_ENTRIES = 20
+
 async def dump(update, context):
     if not is_owner(update.message.from_user.id):
         return
-    config = load_json_file(CONFIG_PATH)
-    user_data = load_json_file(USER_DATA_PATH)
+    config = await asyncio.to_thread(cached_load_json, CONFIG_PATH)
+    # Serialize only the head of each dict, so the work doesn't grow with the data
+    config_head = dict(islice(config.items(), DUMP_MAX_ENTRIES))
+    user_data_head = {}
+    for group_id in islice(config, DUMP_MAX_ENTRIES):
+        users = await load_user_data(group_id)
+        user_data_head[group_id] = dict(islice(users.items(), DUMP_MAX_ENTRIES))
     text = (
-        f"CONFIG.json:\n{json.dumps(config, indent=2)[:2000]}\n\n"
-        f"USER_DATA.json:\n{json.dumps(user_data, indent=2)[:2000]}"
+        f"CONFIG.json:\n{_pretty_json(config_head)[:2000]}\n\n"
+        f"USER_DATA.json:\n{_pretty_json(user_data_head)[:2000]}"
     )
     await update.message.reply_text(f"```\n{text}\n```", parse_mode="Markdown")
 
+# ---------------------------------------------
+# Command Dispatch
+# ---------------------------------------------
+_GROUP_CHATS = frozenset({"group", "supergroup"})
+_PRIVATE_CHATS = frozenset({"private"})
+
+# command -> [(handler, chat types it runs in, or None for any chat)]
+COMMAND_TABLE = {
+    "start": [
+        (handle_group_start_command, _GROUP_CHATS),
+        (handle_dm_start_command, _PRIVATE_CHATS),
+    ],
+    "help": [(help_command, None)],
+    "guide": [(guide_command, None)],
+    "setup": [(start_setup_flow, _GROUP_CHATS)],
+    "status": [(status, None)],
+    "admin": [(handle_admin_commands, None)],
+    # Debug commands (owner only; test_verify and dump in private chat only)
+    "test_verify": [(test_verify, _PRIVATE_CHATS)],
+    "testbalance": [(test_balance_all, None)],
+    "dump": [(dump, _PRIVATE_CHATS)],
+}
+
+async def handle_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route a /command through COMMAND_TABLE with one dict lookup.
+
+    Mirrors CommandHandler: commands addressed to another bot are ignored and
+    context.args holds the words after the command.
+    """
+    words = update.message.text.split()
+    command, _, target = words[0][1:].partition("@")
+    if target and BOT_USERNAME and target.lower() != BOT_USERNAME.lower():
+        return
+
+    chat_type = update.message.chat.type
+    for handler, chat_types in COMMAND_TABLE.get(command.lower(), ()):
+        if chat_types is None or chat_type in chat_types:
+            context.args = words[1:]
+            await handler(update, context)
+            return
+
+# callback_data prefix (text before the first "_") -> handler; every other
+# button belongs to the verification flow
+CALLBACK_TABLE = {
+    "approve": handle_whitelist_approval,
+    "reject": handle_whitelist_approval,
+}
+
+async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route a button press through CALLBACK_TABLE with one dict lookup."""
+    prefix = (update.callback_query.data or "").partition("_")[0]
+    handler = CALLBACK_TABLE.get(prefix, handle_verification_button)
+    await handler(update, context)
+
 # ---------------------------------------------
 # Main - FIXED HANDLER REGISTRATION
 # ---------------------------------------------
 async def post_init(application: Application):
     """Get bot username after initialization and set up commands."""
-    global BOT_USERNAME
+    global BOT_USERNAME, _LINK_TMPL
     bot_info = await application.bot.get_me()
     BOT_USERNAME = bot_info.username
+    _LINK_TMPL = f"https://t.me/{BOT_USERNAME or 'wenpadgatebot'}?start={{}}"
     logger.info(f"Bot username set to: {BOT_USERNAME}")
+
+    await asyncio.to_thread(migrate_user_data)
+    await asyncio.to_thread(migrate_admin_state)
+    await asyncio.to_thread(migrate_verification_links)
+    _blocked_groups.update(await asyncio.to_thread(get_blocked_groups))
+    _whitelisted_groups.update(await asyncio.to_thread(get_whitelist))
     
+    start_transfer_workers()
+
     # Set up bot commands menu
     await set_bot_commands(application)
 
+async def post_shutdown(application: Application):
+    """Release shared resources when the bot stops."""
+    await stop_transfer_workers()
+    await flush_user_data()
+    await close_http_session()
+    logger.info("✅ HTTP session closed")
+
 def main():
     """Start the bot."""
     print("🔧 Creating Telegram application...")
@@ -1715,7 +2043,13 @@ def main():
 
     try:
         # Create application
-        app = Application.builder().token(TOKEN).post_init(post_init).build()
+        app = (
+            Application.builder()
+            .token(TOKEN)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
         print("✅ Application created successfully")
     except Exception as e:
         print(f"❌ Failed to create Telegram application: {e}")
@@ -1723,29 +2057,11 @@ def main():
         traceback.print_exc()
         return
     
-    # Add handlers - FIXED: Separate handlers for group vs DM
-    app.add_handler(CommandHandler("start", handle_group_start_command, filters=filters.ChatType.GROUPS | filters.ChatType.SUPERGROUP))
-    app.add_handler(CommandHandler("start", handle_dm_start_command, filters=filters.ChatType.PRIVATE))
-    app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("guide", guide_command))
-    app.add_handler(CommandHandler(
-        "setup",
-        start_setup_flow,
-        filters=filters.ChatType.GROUPS | filters.ChatType.SUPERGROUP
-    ))
-    app.add_handler(CommandHandler("status", status))
-    app.add_handler(CommandHandler("admin", handle_admin_commands))
-    
-    # Add debug commands (owner only, private chat only)
-    app.add_handler(CommandHandler("test_verify", test_verify, filters=filters.ChatType.PRIVATE))
-    app.add_handler(CommandHandler("testbalance", test_balance_all))
-    app.add_handler(CommandHandler("dump", dump, filters=filters.ChatType.PRIVATE))
-    
-    # Handle whitelist approval buttons
-    app.add_handler(CallbackQueryHandler(handle_whitelist_approval, pattern=r"^(approve|reject)_"))
+    # All commands go through one handler (see COMMAND_TABLE; start is split group vs DM there)
+    app.add_handler(MessageHandler(filters.UpdateType.MESSAGE & filters.COMMAND, handle_command))
     
-    # Handle verification buttons
-    app.add_handler(CallbackQueryHandler(handle_verification_button))
+    # All buttons go through one handler (whitelist approve/reject vs verification, see CALLBACK_TABLE)
+    app.add_handler(CallbackQueryHandler(handle_callback_query))
     
     # Handle DM messages for verification
     app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE & ~filters.COMMAND, handle_dm_message))
@@ -1772,11 +2088,14 @@ def main():
     
     # RUN WITH ERROR HANDLING
     try:
+        # Reissue long polls immediately and let Telegram hold each one up to 50s
         app.run_polling(
-            poll_interval=1.0,
-            timeout=10,
+            poll_interval=0,
+            timeout=50,
             drop_pending_updates=True,
-            allowed_updates=Update.ALL_TYPES
+            # Every handler is a Message/CommandHandler (join events arrive as
+            # messages) or a CallbackQueryHandler; skip all other update types
+            allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY]
         )
     except Exception as e:
         logger.error(f"❌ Bot crashed: {e}")
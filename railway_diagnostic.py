@@ -11,6 +11,28 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson (C extension) when available, stdlib json otherwise
+try:
+    import orjson
+
+    def _read_json(path):
+        """Parse a JSON file"""
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    def _pretty_json(data):
+        """Serialize to indented JSON text"""
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    def _read_json(path):
+        """Parse a JSON file"""
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _pretty_json(data):
+        """Serialize to indented JSON text"""
+        return json.dumps(data, indent=2)
+
 def diagnose_data_storage():
     """Diagnose where data is being stored and read from"""
 
@@ -35,10 +57,10 @@ def diagnose_data_storage():
     print("\n🔌 DATABASE CONNECTION TEST:")
     if database_url:
         try:
-            from database_simple import get_db_connection
-            conn, db_type = get_db_connection()
+            from database_simple import db_connection
+            with db_connection() as (conn, db_type):
+                conn.cursor().execute("SELECT 1")
             print(f"✅ Database connection successful: {db_type}")
-            conn.close()
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
     else:
@@ -69,8 +91,7 @@ def diagnose_data_storage():
     print("\nUsing FILE SYSTEM method...")
     if os.path.exists(config_path):
         try:
-            with open(config_path, "r") as f:
-                file_config = json.load(f)
+            file_config = _read_json(config_path)
             print(f"✅ Config loaded from file: {len(file_config)} groups found")
 
             for group_id, group_config in file_config.items():
@@ -88,8 +109,7 @@ def diagnose_data_storage():
     if database_url and os.path.exists(config_path):
         try:
             from database_simple import load_json_file as db_load
-            with open(config_path, "r") as f:
-                file_data = json.load(f)
+            file_data = _read_json(config_path)
             db_data = db_load(config_path)
 
             if file_data == db_data:
@@ -97,9 +117,9 @@ def diagnose_data_storage():
             else:
                 print("❌ File and database data are DIFFERENT!")
                 print("Database data:")
-                print(json.dumps(db_data, indent=2)[:500])
+                print(_pretty_json(db_data)[:500])
                 print("\nFile data:")
-                print(json.dumps(file_data, indent=2)[:500])
+                print(_pretty_json(file_data)[:500])
         except Exception as e:
             print(f"❌ Consistency check failed: {e}")
 
@@ -95,8 +95,7 @@ async def verify_all_members_single_service(bot, group_id: str, group_config: di
         logger.info(f"🔄 Background verification for group {group_id}")
 
         # SICHER: Verwende bestehende JSON-Loading Logik
-        user_data = load_json_file(USER_DATA_PATH)
-        group_users = user_data.get(group_id, {})
+        group_users = load_user_data_for_group(group_id)
 
         logger.info(f"Found {len(group_users)} users to verify in group {group_id}")
 
@@ -125,8 +124,8 @@ async def verify_all_members_single_service(bot, group_id: str, group_config: di
                         await bot.unban_chat_member(chat_id=group_id, user_id=int(user_id))
 
                         # SICHER: Update user data mit bestehender Logik
-                        user_data[group_id][user_id]["verified"] = False
-                        save_json_file(USER_DATA_PATH, user_data)
+                        group_users[user_id]["verified"] = False
+                        save_user_data_for_group(group_id, group_users)
 
                         removed_count += 1
                         logger.info(f"✅ Successfully removed user {user_id}")
@@ -9,18 +9,31 @@ import json
 import os
 import asyncio
 import re
+import threading
 import time
-from typing import Dict, Any
-
-# Import blockchain functions from blockchain_integrations module
-from blockchain_integrations import (
-    verify_user_balance, get_token_decimals,
-    get_token_balance_moralis,
-)
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# orjson (C extension) when available, stdlib json otherwise; both work on bytes
+try:
+    import orjson
+
+    def _dumps(data, pretty=True):
+        """Serialize to JSON bytes, indented when pretty"""
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0))
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(data, pretty=True):
+        """Serialize to JSON bytes, indented when pretty"""
+        return json.dumps(data, indent=2 if pretty else None).encode()
+
+    _loads = json.loads
+
 # Support Railway persistent volume via DATA_DIR
 DATA_DIR = os.getenv("DATA_DIR", "/app/data" if os.path.exists("/app/data") else ".")
 
@@ -33,11 +46,30 @@ USER_DATA_PATH = os.path.join(DATA_DIR, "user_data.json")
 WHITELIST_PATH = os.path.join(DATA_DIR, "whitelist.json")
 PENDING_WHITELIST_PATH = os.path.join(DATA_DIR, "pending_whitelist.json")
 REJECTED_GROUPS_PATH = os.path.join(DATA_DIR, "rejected_groups.json")
+# Rejections, pending requests and the whitelist share one file, saved together:
+# {"rejections": {...}, "pending": {...}, "whitelist": {...}}. The three files
+# above are only read once by migrate_admin_state
+ADMIN_STATE_PATH = os.path.join(DATA_DIR, "admin_state.json")
+_ADMIN_SECTIONS = {
+    "rejections": REJECTED_GROUPS_PATH,
+    "pending": PENDING_WHITELIST_PATH,
+    "whitelist": WHITELIST_PATH,
+}
+# user_data is kept one file per group: user_data/<group_id>.json holds {user_id: info}.
+# USER_DATA_PATH is the legacy single file, split up by migrate_user_data
+USER_DATA_DIR = os.path.join(DATA_DIR, "user_data")
+
+# Large, machine-maintained files are saved compact; the rest stay indented for hand edits
+_COMPACT_PATHS = frozenset({USER_DATA_PATH, ADMIN_STATE_PATH})
 
 
 # ---------------------------------------------
 # Token and Environment Setup
 # ---------------------------------------------
+# KEY=value lines in .env
+ENV_RE = re.compile(r'^\s*([A-Z_][A-Z0-9_]*)\s*=\s*(.*?)\s*$')
+
+@lru_cache(maxsize=1)
 def get_token_from_env():
     """Fetch secrets from environment variables or fallback .env file."""
     telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -48,16 +80,12 @@ def get_token_from_env():
     if not (telegram_token and moralis_key and etherscan_key):
         try:
             with open(".env", "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith("TELEGRAM_BOT_TOKEN=") and not telegram_token:
-                        telegram_token = line.split("=", 1)[1].strip()
-                    elif line.startswith("MORALIS_API_KEY=") and not moralis_key:
-                        moralis_key = line.split("=", 1)[1].strip()
-                    elif line.startswith("ETHERSCAN_API_KEY=") and not etherscan_key:
-                        etherscan_key = line.split("=", 1)[1].strip()
+                env = {m.group(1): m.group(2) for line in f if (m := ENV_RE.match(line))}
         except FileNotFoundError:
-            pass
+            env = {}
+        telegram_token = telegram_token or env.get("TELEGRAM_BOT_TOKEN")
+        moralis_key = moralis_key or env.get("MORALIS_API_KEY")
+        etherscan_key = etherscan_key or env.get("ETHERSCAN_API_KEY")
 
     return telegram_token, moralis_key, etherscan_key
 
@@ -67,53 +95,244 @@ TOKEN, MORALIS_API_KEY, ETHERSCAN_API_KEY = get_token_from_env()
 # ---------------------------------------------
 # File Utilities
 # ---------------------------------------------
+# Storage backend, decided once at import: database_simple (Railway PostgreSQL,
+# SQLite fallback) when DATABASE_URL is set, plain files otherwise
+_USE_DB = bool(os.getenv("DATABASE_URL"))
+if _USE_DB:
+    from database_simple import (
+        load_json_file as _db_load, save_json_file as _db_save, CACHE_TTL as _DB_CACHE_TTL,
+    )
+
 def load_json_file(file_path):
-    """Load JSON data from database or file (Railway-optimized)"""
-    # Check if we have database connection (Railway PostgreSQL)
-    if os.getenv("DATABASE_URL"):
-        from database_simple import load_json_file as db_load
-        return db_load(file_path)
+    """Load JSON data from database or file (Railway-optimized)
+
+    Always reads current data, so it is safe for read-modify-write; read-only
+    callers should use cached_load_json.
+    """
+    if _USE_DB:
+        return _db_load(file_path, fresh=True)
 
     # Fallback to file system
     if os.path.exists(file_path):
         try:
-            with open(file_path, "r") as f:
-                return json.load(f)
+            with open(file_path, "rb") as f:
+                return _loads(f.read())
         except Exception as e:
             logger.error(f"Error loading {file_path}: {e}")
             return {}
     return {}
 
-def save_json_file(file_path, data):
-    """Save JSON data to database or file (Railway-optimized)"""
-    # Check if we have database connection (Railway PostgreSQL)
-    if os.getenv("DATABASE_URL"):
-        from database_simple import save_json_file as db_save
-        return db_save(file_path, data)
+# Parsed JSON keyed by path -> (mtime_ns or save version, data, loaded_at)
+_json_cache: Dict[str, tuple] = {}
+_json_cache_lock = threading.Lock()
+
+# Per-path counter bumped by save_json_file; tags cache entries in DATABASE_URL
+# mode, where there is no mtime to compare
+_json_versions: Dict[str, int] = {}
+
+# Set DISABLE_JSON_CACHE=1 to make cached_load_json always reload
+_JSON_CACHE_ENABLED = not os.getenv("DISABLE_JSON_CACHE")
+
+def cached_load_json(file_path):
+    """Load JSON like load_json_file, re-parsing only when the data may have changed.
+
+    Files are re-read when their mtime changes. With DATABASE_URL an entry is
+    reused until this process saves the path again, or for database_simple's
+    CACHE_TTL (so writes by the cron service still show up).
+    The returned object is shared between callers - copy it before mutating.
+    """
+    if not _JSON_CACHE_ENABLED:
+        return load_json_file(file_path)
+
+    if _USE_DB:
+        tag = _json_versions.get(file_path, 0)
+        with _json_cache_lock:
+            cached = _json_cache.get(file_path)
+        if cached and cached[0] == tag and time.monotonic() - cached[2] < _DB_CACHE_TTL:
+            return cached[1]
+    else:
+        try:
+            tag = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return {}
+        with _json_cache_lock:
+            cached = _json_cache.get(file_path)
+        if cached and cached[0] == tag:
+            return cached[1]
+
+    data = load_json_file(file_path)
+    with _json_cache_lock:
+        _json_cache[file_path] = (tag, data, time.monotonic())
+    return data
+
+# Loads in flight keyed by path, so concurrent readers share one read
+_inflight_loads: Dict[str, asyncio.Future] = {}
+
+async def load_json_once(file_path):
+    """Async cached_load_json - concurrent callers for the same path share a single load."""
+    future = _inflight_loads.get(file_path)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().run_in_executor(None, cached_load_json, file_path)
+    _inflight_loads[file_path] = future
+    try:
+        return await asyncio.shield(future)
+    finally:
+        if _inflight_loads.get(file_path) is future:
+            del _inflight_loads[file_path]
+
+def save_json_file(file_path, data, pretty=None):
+    """Save JSON data to database or file (Railway-optimized)
+
+    pretty defaults to indenting everything except _COMPACT_PATHS.
+    """
+    with _json_cache_lock:
+        _json_cache.pop(file_path, None)
+        _json_versions[file_path] = _json_versions.get(file_path, 0) + 1
+
+    if _USE_DB:
+        return _db_save(file_path, data)
 
     # Fallback to file system
+    # Write a temp file and rename it over the target, so readers (and a crash
+    # mid-write) never see a half-written file
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=2)
+        with open(tmp_path, "wb") as f:
+            f.write(_dumps(data, file_path not in _COMPACT_PATHS if pretty is None else pretty))
+        os.replace(tmp_path, file_path)
         return True
     except Exception as e:
         logger.error(f"Error saving {file_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
         return False
 
+def group_user_data_path(group_id):
+    """Path of one group's user_data file."""
+    return os.path.join(USER_DATA_DIR, f"{group_id}.json")
+
+def load_user_data_for_group(group_id):
+    """Load one group's members ({user_id: info}); empty if the group has none."""
+    return load_json_file(group_user_data_path(group_id))
+
+def save_user_data_for_group(group_id, group_users):
+    """Save one group's members, leaving every other group's file untouched."""
+    if not _USE_DB:
+        os.makedirs(USER_DATA_DIR, exist_ok=True)
+    return save_json_file(group_user_data_path(group_id), group_users, pretty=False)
+
+def migrate_user_data():
+    """One-time split of the legacy user_data.json into per-group files.
+
+    Members already in a group's file win over the legacy copy. Afterwards the
+    legacy file is renamed to user_data.json.migrated (emptied in the database).
+    Returns how many groups were migrated.
+    """
+    legacy = load_json_file(USER_DATA_PATH)
+    if not legacy:
+        return 0
+    for group_id, group_users in legacy.items():
+        merged = {**group_users, **load_user_data_for_group(group_id)}
+        if not save_user_data_for_group(group_id, merged):
+            logger.error(f"Migrating user_data for group {group_id} failed; keeping {USER_DATA_PATH}")
+            return 0
+    if _USE_DB:
+        save_json_file(USER_DATA_PATH, {})
+    else:
+        os.replace(USER_DATA_PATH, f"{USER_DATA_PATH}.migrated")
+    logger.info(f"Split {USER_DATA_PATH} into {len(legacy)} per-group files")
+    return len(legacy)
+
+# The owner id in both forms callers pass: Telegram's int and the str used as a JSON key
+OWNER_IDS = frozenset(
+    {ADMIN_USER_ID, int(ADMIN_USER_ID)} if ADMIN_USER_ID.lstrip("-").isdigit() else {ADMIN_USER_ID}
+)
+
 def is_owner(user_id):
     """Check if user is the bot owner."""
-    return str(user_id) == ADMIN_USER_ID
+    return user_id in OWNER_IDS
 
 # ---------------------------------------------
 # Web3 and Balance Verification Functions
 # ---------------------------------------------
 
+# ---------------------------------------------
+# Batched JSON Updates
+# ---------------------------------------------
+class JsonStore:
+    """A JSON file loaded once for a batch of updates (see json_store)."""
+    __slots__ = ("path", "data", "dirty", "saved")
+
+    def __init__(self, path):
+        self.path = path
+        self.data = load_json_file(path)
+        self.dirty = False
+        self.saved = True
+
+# file_path -> lock held for a whole json_store block, so read-modify-write
+# updates running in worker threads (asyncio.to_thread) can't drop each other's
+# changes. Reentrant: a helper may open the same store again on its thread
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+def _store_lock(file_path):
+    with _store_locks_guard:
+        return _store_locks.setdefault(file_path, threading.RLock())
+
+@contextmanager
+def json_store(file_path):
+    """Load file_path once, let several updates mutate store.data, then save once.
+
+    Updates set store.dirty; the file is written on exit only if something
+    changed (and not at all if the block raises). store.saved holds the result.
+    Other json_store blocks on the same path in this process wait until then.
+    """
+    with _store_lock(file_path):
+        store = JsonStore(file_path)
+        yield store
+        if store.dirty:
+            store.saved = save_json_file(file_path, store.data)
+
+def admin_state_store():
+    """json_store over admin_state.json; updates work on store.data[<section>]."""
+    return json_store(ADMIN_STATE_PATH)
+
+def _admin_section(section):
+    """Read-only view of one admin_state section (shared cache - don't mutate)."""
+    return cached_load_json(ADMIN_STATE_PATH).get(section) or {}
+
+def migrate_admin_state():
+    """One-time merge of rejected_groups/pending_whitelist/whitelist.json into admin_state.json.
+
+    Only sections missing from admin_state are filled from their legacy file,
+    so this is a no-op once they exist. Returns the names of migrated sections.
+    """
+    with admin_state_store() as store:
+        migrated = [section for section in _ADMIN_SECTIONS if section not in store.data]
+        for section in migrated:
+            store.data[section] = load_json_file(_ADMIN_SECTIONS[section])
+        store.dirty = bool(migrated)
+    if migrated:
+        logger.info(f"Moved {', '.join(migrated)} into {ADMIN_STATE_PATH}")
+    return migrated
+
 # ---------------------------------------------
 # 3-Strike Rejection Tracking System
 # ---------------------------------------------
-def track_rejection(group_id, group_name=None, admin_id=None, admin_name=None):
-    """Track a rejection for a group. Returns True if group should be blocked (3+ strikes)."""
-    rejected_groups = load_json_file(REJECTED_GROUPS_PATH)
+def track_rejection(group_id, group_name=None, admin_id=None, admin_name=None, store=None):
+    """Track a rejection for a group. Returns (blocked, rejection_count); blocked at 3+ strikes.
+
+    Pass an admin_state_store() as store to batch several updates into one write.
+    """
+    if store is None:
+        with admin_state_store() as store:
+            return track_rejection(group_id, group_name, admin_id, admin_name, store)
+
+    rejected_groups = store.data.setdefault("rejections", {})
     current_time = int(time.time())
 
     if group_id not in rejected_groups:
@@ -143,72 +362,152 @@ def track_rejection(group_id, group_name=None, admin_id=None, admin_name=None):
     if rejected_groups[group_id]["rejection_count"] >= 3:
         rejected_groups[group_id]["blocked"] = True
 
-    save_json_file(REJECTED_GROUPS_PATH, rejected_groups)
-    return rejected_groups[group_id]["blocked"]
+    store.dirty = True
+    return rejected_groups[group_id]["blocked"], rejected_groups[group_id]["rejection_count"]
+
+def bulk_track_rejections(events):
+    """Track several rejections with a single write.
+
+    events: iterable of (group_id, group_name, admin_id, admin_name) tuples.
+    Returns one (blocked, rejection_count) per event, in order.
+    """
+    with admin_state_store() as store:
+        return [track_rejection(*event, store=store) for event in events]
+
+# (rejected_groups dict it was built from, ids of its blocked groups); rebuilt
+# only when cached_load_json hands back a freshly loaded dict
+_blocked_index = (None, frozenset())
+
+def _blocked_group_ids(rejected_groups):
+    """Ids of the blocked groups in rejected_groups, derived once per loaded dict."""
+    global _blocked_index
+    source, blocked_ids = _blocked_index
+    if source is not rejected_groups:
+        blocked_ids = frozenset(
+            group_id for group_id, data in rejected_groups.items() if data.get("blocked", False)
+        )
+        _blocked_index = (rejected_groups, blocked_ids)
+    return blocked_ids
 
 def is_group_blocked(group_id):
     """Check if a group is blocked due to 3+ rejections."""
-    rejected_groups = load_json_file(REJECTED_GROUPS_PATH)
-    group_data = rejected_groups.get(group_id, {})
-    return group_data.get("blocked", False)
+    return group_id in _blocked_group_ids(_admin_section("rejections"))
 
 def get_rejection_count(group_id):
     """Get the current rejection count for a group."""
-    rejected_groups = load_json_file(REJECTED_GROUPS_PATH)
-    group_data = rejected_groups.get(group_id, {})
+    group_data = _admin_section("rejections").get(group_id, {})
     return group_data.get("rejection_count", 0)
 
-def reset_rejection_count(group_id):
+def reset_rejection_count(group_id, store=None):
     """Reset rejection count for a group (admin function)."""
-    rejected_groups = load_json_file(REJECTED_GROUPS_PATH)
+    if store is None:
+        with admin_state_store() as store:
+            reset_rejection_count(group_id, store)
+        return store.saved
+
+    rejected_groups = store.data.setdefault("rejections", {})
     if group_id in rejected_groups:
         rejected_groups[group_id]["rejection_count"] = 0
         rejected_groups[group_id]["blocked"] = False
-        return save_json_file(REJECTED_GROUPS_PATH, rejected_groups)
+        store.dirty = True
     return True
 
 def get_blocked_groups():
     """Get all blocked groups for admin commands."""
-    rejected_groups = load_json_file(REJECTED_GROUPS_PATH)
-    blocked = {}
-    for group_id, data in rejected_groups.items():
-        if data.get("blocked", False):
-            blocked[group_id] = data
-    return blocked
+    rejected_groups = _admin_section("rejections")
+    return {group_id: rejected_groups[group_id] for group_id in _blocked_group_ids(rejected_groups)}
 
 def get_all_rejections():
     """Get all groups with rejections (for admin viewing)."""
-    return load_json_file(REJECTED_GROUPS_PATH)
+    return _admin_section("rejections")
 
 # ---------------------------------------------
 # Whitelist Management Functions
 # ---------------------------------------------
+def get_whitelist():
+    """All whitelisted groups ({group_id: True})."""
+    return _admin_section("whitelist")
+
+def get_pending_whitelist():
+    """All pending whitelist requests ({group_id: request info})."""
+    return _admin_section("pending")
+
 def is_group_whitelisted(group_id):
     """Check if group is whitelisted."""
-    whitelist = load_json_file(WHITELIST_PATH)
-    return group_id in whitelist
+    return group_id in get_whitelist()
 
-def whitelist_group(group_id):
+def whitelist_group(group_id, store=None):
     """Add group to whitelist."""
-    whitelist = load_json_file(WHITELIST_PATH)
-    whitelist[group_id] = True
-    return save_json_file(WHITELIST_PATH, whitelist)
+    if store is None:
+        with admin_state_store() as store:
+            whitelist_group(group_id, store)
+        return store.saved
+
+    store.data.setdefault("whitelist", {})[group_id] = True
+    store.dirty = True
+    return True
 
-def add_pending_whitelist(group_id, group_name, admin_id, admin_name):
+def add_pending_whitelist(group_id, group_name, admin_id, admin_name, store=None):
     """Add group to pending whitelist."""
-    pending = load_json_file(PENDING_WHITELIST_PATH)
-    pending[group_id] = {
+    if store is None:
+        with admin_state_store() as store:
+            add_pending_whitelist(group_id, group_name, admin_id, admin_name, store)
+        return store.saved
+
+    store.data.setdefault("pending", {})[group_id] = {
         "group_name": group_name,
         "admin_id": admin_id,
         "admin_name": admin_name,
         "timestamp": int(time.time())
     }
-    return save_json_file(PENDING_WHITELIST_PATH, pending)
+    store.dirty = True
+    return True
 
-def remove_pending_whitelist(group_id):
+def remove_pending_whitelist(group_id, store=None):
     """Remove group from pending whitelist."""
-    pending = load_json_file(PENDING_WHITELIST_PATH)
-    if group_id in pending:
-        del pending[group_id]
-        return save_json_file(PENDING_WHITELIST_PATH, pending)
-    return True
\ No newline at end of file
+    if store is None:
+        with admin_state_store() as store:
+            remove_pending_whitelist(group_id, store)
+        return store.saved
+
+    if store.data.setdefault("pending", {}).pop(group_id, None) is not None:
+        store.dirty = True
+    return True
+
+def pop_pending_whitelist(group_id, store=None):
+    """Remove group from pending whitelist and return its request info ({} if none)."""
+    if store is None:
+        with admin_state_store() as store:
+            return pop_pending_whitelist(group_id, store)
+
+    group_info = store.data.setdefault("pending", {}).pop(group_id, None)
+    if group_info is None:
+        return {}
+    store.dirty = True
+    return group_info
+
+def approve_pending_whitelist(group_id):
+    """Whitelist a group and drop its pending request in one write.
+
+    Returns (saved, request info or {}).
+    """
+    with admin_state_store() as store:
+        whitelist_group(group_id, store)
+        group_info = pop_pending_whitelist(group_id, store)
+    return store.saved, group_info
+
+def reject_pending_whitelist(group_id):
+    """Drop a group's pending request and count the rejection, in one write.
+
+    Returns (request info or {}, blocked, rejection_count).
+    """
+    with admin_state_store() as store:
+        group_info = pop_pending_whitelist(group_id, store)
+        blocked, rejection_count = track_rejection(
+            group_id,
+            group_info.get("group_name", f"Group {group_id}"),
+            group_info.get("admin_id"),
+            group_info.get("admin_name"),
+            store,
+        )
+    return group_info, blocked, rejection_count
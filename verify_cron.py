@@ -5,7 +5,9 @@ This script runs as a separate Railway service with cron schedule: "0 */6 * * *"
 """
 
 import logging
+import os
 import sys
+import time
 import asyncio
 from typing import Dict, Any
 from telegram import Bot
@@ -13,19 +15,36 @@ from telegram import Bot
 # Import verification functions from verification module (no bot initialization)
 from verification import (
     load_json_file, save_json_file, is_owner,
-    CONFIG_PATH, USER_DATA_PATH, get_token_from_env
+    load_user_data_for_group, save_user_data_for_group, migrate_user_data,
+    CONFIG_PATH, DATA_DIR, get_token_from_env
 )
 
 # Import blockchain functions
-from blockchain_integrations import verify_user_balance
+from blockchain_integrations import (
+    verify_user_balance_cached, get_token_balances_batch,
+    aclose as close_http_session,
+)
 
+# Group titles persisted between cron runs: str(group_id) -> {"title": str, "ts": int}
+GROUP_NAMES_PATH = os.path.join(DATA_DIR, "group_names.json")
+GROUP_NAME_TTL = 7 * 86400
 GROUP_NAMES = {}
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Groups verified at the same time; bounds the overlapping RPC and Telegram traffic
+GROUP_CONCURRENCY = int(os.getenv("GROUP_CONCURRENCY", "8"))
+
+# Member removals (ban + unban) run on a few queue workers so balance checks never
+# wait on Telegram; TELEGRAM_RATE keeps the calls under the ~20/s admin-API limit
+REMOVAL_WORKERS = int(os.getenv("REMOVAL_WORKERS", "2"))
+TELEGRAM_RATE = 20
+
+# Members whose balance the bot confirmed within this many seconds are not re-checked
+RECHECK_TTL = int(os.getenv("RECHECK_TTL", "3600"))
+
+# Per-user balance checks (Moralis/RPC) in flight across all groups
+MORALIS_MAX_CONCURRENCY = int(os.getenv("MORALIS_MAX_CONCURRENCY", "10"))
+_BALANCE_SEM = asyncio.Semaphore(MORALIS_MAX_CONCURRENCY)
+
 logger = logging.getLogger(__name__)
 
 # Get bot token
@@ -34,63 +53,133 @@ if not TOKEN:
     logger.error("ERROR: Could not find TELEGRAM_BOT_TOKEN")
     sys.exit(1)
 
-async def verify_all_members(bot: Bot, group_id: str, group_config: Dict[str, Any]):
-    """Verify all existing group members against token requirements."""
+async def verify_all_members(bot: Bot, group_id: str, group_config: Dict[str, Any], removals=None):
+    """Verify all existing group members against token requirements.
+
+    Loads and saves only this group's user_data file. Returns how many members
+    were removed. With a removals queue (see verify_groups) kicks are run by its
+    workers; members are only marked unverified once their kick succeeded.
+    """
+    removed_count = 0
     try:
         group_name = await get_group_name(bot, int(group_id))
         logger.info(f"🔄 Starting periodic verification for group {group_id} ({group_name})")
         logger.info(f"📊 Using config: min_balance={group_config.get('min_balance')}, token={group_config.get('token')}")
 
-        user_data = load_json_file(USER_DATA_PATH)
-        group_users = user_data.get(group_id, {})
+        group_users = await asyncio.to_thread(load_user_data_for_group, group_id)
 
         logger.info(f"Found {len(group_users)} users to verify in group {group_id} ({group_name})")
 
         verified_count = 0
-        removed_count = 0
         error_count = 0
 
-        for user_id, user_info in group_users.items():
-            # Skip owner - permanent access
-            if is_owner(int(user_id)):
-                logger.info(f"Skipping owner {user_id}")
-                continue
+        # Only verified non-owner members need a balance check (owner has permanent
+        # access), and not those whose balance was confirmed within RECHECK_TTL
+        recheck_after = time.time() - RECHECK_TTL
+        to_check = [
+            (user_id, user_info["address"])
+            for user_id, user_info in group_users.items()
+            if user_info.get("verified") and not is_owner(user_id)
+            and not (user_info.get("had_balance") and user_info.get("verified_at", 0) > recheck_after)
+        ]
+        logger.info(f"{len(to_check)} verified members need a balance check in group {group_id}")
+
+        # Read every wallet's ATA balance up front in batched RPC calls;
+        # only wallets that look short fall through to the full per-user check
+        # (which also covers non-ATA token accounts and Moralis)
+        prefetched = await get_token_balances_batch(
+            [user_address for _, user_address in to_check],
+            group_config["token"],
+        )
+        min_balance = group_config["min_balance"]
 
-            if user_info.get("verified"):
-                user_address = user_info["address"]
-                logger.info(f"Verifying user {user_id} with address {user_address}")
+        async def check(user_address):
+            if prefetched.get(user_address, 0.0) >= min_balance:
+                return True
+            async with _BALANCE_SEM:
+                return await verify_user_balance_cached(group_config, user_address)
 
-                has_balance = await verify_user_balance(group_config, user_address)
+        # Check everyone concurrently (bounded by MORALIS_MAX_CONCURRENCY)
+        checks = await asyncio.gather(
+            *(check(user_address) for _, user_address in to_check),
+            return_exceptions=True,
+        )
 
-                if not has_balance:
-                    logger.info(f"❌ User {user_id} has insufficient balance, removing...")
-                    try:
-                        # User no longer meets requirements, remove them
-                        await bot.ban_chat_member(chat_id=group_id, user_id=int(user_id))
-                        await bot.unban_chat_member(chat_id=group_id, user_id=int(user_id))
+        to_remove = []
+        for (user_id, user_address), has_balance in zip(to_check, checks):
+            if isinstance(has_balance, Exception):
+                error_count += 1
+                logger.error(f"❌ Error checking user {user_id} ({user_address}): {has_balance}")
+            elif not has_balance:
+                logger.info(f"❌ User {user_id} has insufficient balance, removing...")
+                to_remove.append(user_id)
+            else:
+                verified_count += 1
+                logger.info(f"✅ User {user_id} still has sufficient balance")
+
+        # User no longer meets requirements: remove them. Queued kicks report back
+        # through a future, so only members actually removed are marked below
+        if removals is not None:
+            loop = asyncio.get_running_loop()
+            kicks = []
+            for user_id in to_remove:
+                kick = loop.create_future()
+                removals.put_nowait((group_id, int(user_id), kick))
+                kicks.append(kick)
+            results = await asyncio.gather(*kicks, return_exceptions=True)
+        else:
+            results = await asyncio.gather(
+                *(remove_member(bot, group_id, int(user_id)) for user_id in to_remove),
+                return_exceptions=True,
+            )
+        for user_id, result in zip(to_remove, results):
+            if isinstance(result, Exception):
+                error_count += 1
+                logger.error(f"❌ Error removing user {user_id}: {result}")
+                continue
 
-                        # Update user data
-                        user_data[group_id][user_id]["verified"] = False
-                        save_json_file(USER_DATA_PATH, user_data)
+            # Update user data (saved once, after the whole group)
+            group_users[user_id]["verified"] = False
 
-                        removed_count += 1
-                        logger.info(f"✅ Successfully removed user {user_id}")
-                    except Exception as e:
-                        error_count += 1
-                        logger.error(f"❌ Error removing user {user_id}: {e}")
-                else:
-                    verified_count += 1
-                    logger.info(f"✅ User {user_id} still has sufficient balance")
+            removed_count += 1
+            logger.info(f"✅ Successfully removed user {user_id}")
+
+        if removed_count:
+            await asyncio.to_thread(save_user_data_for_group, group_id, group_users)
 
         logger.info(f"📊 Verification completed: {verified_count} verified, {removed_count} removed, {error_count} errors")
 
     except Exception as e:
         logger.error(f"❌ Error in periodic verification for group {group_id}: {e}")
+    return removed_count
+
+async def remove_member(bot: Bot, group_id: str, user_id: int):
+    """Kick a member (ban, then unban so they can rejoin once verified again)."""
+    await bot.ban_chat_member(chat_id=group_id, user_id=user_id)
+    await bot.unban_chat_member(chat_id=group_id, user_id=user_id)
+
+async def _removal_worker(bot: Bot, queue: asyncio.Queue, interval: float):
+    """Kick queued (group_id, user_id, future) members, at most one ban + unban per interval.
+
+    The future gets None once the member is removed, or the exception if the kick failed.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        group_id, user_id, kick = await queue.get()
+        started = loop.time()
+        try:
+            await remove_member(bot, group_id, user_id)
+            kick.set_result(None)
+        except Exception as e:
+            kick.set_exception(e)
+        finally:
+            queue.task_done()
+        await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
 
 async def periodic_verification():
     """Periodically verify all members in configured groups."""
     # ALWAYS reload fresh config from database/file
-    config = load_json_file(CONFIG_PATH)
+    config = await asyncio.to_thread(load_json_file, CONFIG_PATH)
 
     if not config:
         logger.info("No groups configured for verification")
@@ -100,53 +189,90 @@ async def periodic_verification():
 
     # Create bot instance
     bot = Bot(token=TOKEN)
-    
-    # List configured groups with names
-    for gid in config.keys():
-        try:
-            name = await get_group_name(bot, int(gid))
-        except Exception:
-            name = str(gid)
-        logger.info(f"   • Group {gid} ({name})")  
 
-    # Log the actual config values being used
-    for gid, gconf in config.items():
-        logger.info(f"📋 Group {gid} config: token={gconf.get('token')}, min_balance={gconf.get('min_balance')}")
+    # Each group's name and config are logged as verify_all_members reaches it
+    await verify_groups(bot, config)
 
-    # Create bot instance
-    bot = Bot(token=TOKEN)
+    logger.info("✅ Periodic verification cycle completed")
 
-    for group_id, group_config in config.items():
-        group_name = await get_group_name(bot, int(group_id))
-        logger.info(f"Verifying members in group {group_id} ({group_name})")
-        # Reload config for each group to ensure fresh data
-        fresh_config = load_json_file(CONFIG_PATH)
-        fresh_group_config = fresh_config.get(group_id, group_config)
-        await verify_all_members(bot, group_id, fresh_group_config)
+async def verify_groups(bot: Bot, config: Dict[str, Any]):
+    """Verify every configured group, up to GROUP_CONCURRENCY groups at a time."""
+    semaphore = asyncio.Semaphore(GROUP_CONCURRENCY)
 
-    logger.info("✅ Periodic verification cycle completed")
+    # Each worker makes two calls per removal, so together they stay at TELEGRAM_RATE
+    removals = asyncio.Queue()
+    workers = [
+        asyncio.create_task(_removal_worker(bot, removals, 2 * REMOVAL_WORKERS / TELEGRAM_RATE))
+        for _ in range(REMOVAL_WORKERS)
+    ]
+
+    async def run(group_id, group_config):
+        async with semaphore:
+            return await verify_all_members(bot, group_id, group_config, removals)
+
+    try:
+        results = await asyncio.gather(
+            *(run(gid, gconf) for gid, gconf in config.items()),
+            return_exceptions=True,
+        )
+        await removals.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    removed = 0
+    for group_id, result in zip(config, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Verification failed for group {group_id}: {result}")
+        else:
+            removed += result
+    logger.info(f"📊 Removed {removed} members across {len(config)} groups")
 
 async def get_group_name(bot: Bot, group_id: int) -> str:
-    if group_id in GROUP_NAMES:
-        return GROUP_NAMES[group_id]
+    """Group title, from GROUP_NAMES when fetched within GROUP_NAME_TTL, else via get_chat."""
+    key = str(group_id)
+    entry = GROUP_NAMES.get(key)
+    if entry and time.time() - entry["ts"] < GROUP_NAME_TTL:
+        return entry["title"]
     try:
         chat = await bot.get_chat(group_id)
-        GROUP_NAMES[group_id] = chat.title or str(group_id)
-        return GROUP_NAMES[group_id]
+        title = chat.title or key
+        GROUP_NAMES[key] = {"title": title, "ts": int(time.time())}
+        return title
     except Exception as e:
         logger.error(f"Error fetching group name for {group_id}: {e}")
-        return str(group_id)
+        return entry["title"] if entry else key
 
 async def main():
     """Main function for cron job."""
     logger.info("🚀 Starting Railway cron verification job")
 
+    await asyncio.to_thread(migrate_user_data)
+    GROUP_NAMES.update(await asyncio.to_thread(load_json_file, GROUP_NAMES_PATH))
     try:
         await periodic_verification()
         logger.info("✅ Cron verification job completed successfully")
     except Exception as e:
         logger.error(f"❌ Cron verification job failed: {e}")
         sys.exit(1)
+    finally:
+        # Every balance check in the run shares blockchain_integrations' keep-alive
+        # session; close it before the event loop goes away
+        await close_http_session()
+        await asyncio.to_thread(save_json_file, GROUP_NAMES_PATH, GROUP_NAMES)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Configure logging only when run as the cron job; main.py imports this module
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # uvloop (libuv event loop) when installed, the default asyncio loop otherwise
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())